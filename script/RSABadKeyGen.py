@@ -0,0 +1,165 @@
+#
+# RSABadKeyGen.py - Generator of incorrectly generated RSA keys, for tests
+#                   and benchmarks at any key size
+#
+# Copyright (c) Microsoft Corporation. Licensed under the MIT license.
+#
+# Usage:
+#   python RSABadKeyGen.py -o keys.jsonl [--bits 6144,8192] [--count 1]
+#                          [-e 65537] [--workers N] [--seed S]
+#
+# Every key has a bad prime p with e | p-1 exactly once (e^2 does not
+# divide p-1) and a good prime q with gcd(e, q-1) = 1, and N = p*q has
+# exactly the requested bit length.  The keys are written as JSON lines
+#
+#   {"p": "0x...", "q": "0x...", "N": "0x...", "e": 65537, "bitlength": 6144}
+#
+# which RSATestCases.load_bad_priv_keys reads back, and which RSARecover
+# and RSAKeyTriage accept as they are.
+#
+# Candidates are taken from windows of an arithmetic progression (p = e*k + 1
+# for the bad prime, odd numbers for the good one).  Every window is sieved
+# with the small primes first, and the survivors are tested with
+# Miller-Rabin on a process pool.
+#
+
+from RSAMath import *
+from multiprocessing import Pool
+import RSATestCases
+import argparse
+import json
+import os
+import sys
+
+sieve_limit = 1 << 16
+miller_rabin_rounds = 32
+# Candidates handed to the pool at a time, so that the workers stop soon
+# after the first prime.
+prime_test_batch = 4*os.cpu_count()
+
+# The primes below limit, by the sieve of Eratosthenes.
+def small_primes(limit=sieve_limit):
+    sieve = bytearray([1])*limit
+    sieve[0:2] = b'\x00\x00'
+    for i in range(2, math.isqrt(limit - 1) + 1):
+        if (sieve[i]):
+            sieve[i*i::i] = bytes(len(range(i*i, limit, i)))
+    return [i for i in range(limit) if sieve[i]]
+
+_small_primes = small_primes()
+
+# Miller-Rabin probable prime test of the odd n > 3, with base 2 first so
+# that most composites are rejected after a single exponentiation.
+def miller_rabin(n, rounds=miller_rabin_rounds):
+    (s, d) = (0, n - 1)
+    while (0 == d & 1):
+        (s, d) = (s + 1, d >> 1)
+    bases = [2] + [random.randrange(3, n - 1) for _ in range(rounds - 1)]
+    for a in bases:
+        x = pow(a, d, n)
+        if ((1 == x) or (n - 1 == x)):
+            continue
+        for _ in range(s - 1):
+            x = x*x % n
+            if (n - 1 == x):
+                break
+        else:
+            return False
+    return True
+
+# Sieves the window start + step*i, 0 <= i < count, with the small primes
+# and returns the survivors.  exclude is a list of (m, i0) pairs of further
+# residue classes i = i0 mod m to drop.
+def sieve_window(start, step, count, exclude=()):
+    mask = bytearray([1])*count
+    classes = list(exclude)
+    for s in _small_primes:
+        if (0 == step % s):
+            continue
+        # start + step*i = 0 mod s
+        classes.append((s, (-start)*modinv(step % s, s) % s))
+    for (m, i0) in classes:
+        mask[i0::m] = bytes(len(range(i0, count, m)))
+    return [start + step*i for i in range(count) if mask[i]]
+
+# The first probable prime of candidates, in order, tested on pool.  Returns
+# None if there is none.
+def first_prime(candidates, pool, batch=prime_test_batch):
+    for i in range(0, len(candidates), batch):
+        chunk = candidates[i:i+batch]
+        for (n, is_prime) in zip(chunk, pool.map(miller_rabin, chunk, 1)):
+            if (is_prime):
+                return n
+    return None
+
+# A bad prime of exactly bits bits, with the top two bits set: p = e*k + 1
+# with e not dividing k.
+def generate_bad_prime(bits, e, pool, rng=random, window=None):
+    if (None == window):
+        window = 2*bits
+    lo = (3 << (bits - 2)) + e - 1
+    hi = (1 << bits) - 1 - 2*e*(window + 1)
+    if (lo//e >= hi//e):
+        raise ValueError("Public exponent e is too large for a " + str(bits) + " bit prime.")
+    while True:
+        k = rng.randrange(lo//e, hi//e)
+        k = k + (k & 1)
+        # k + 2*i = 0 mod e drops the candidates with e^2 | p-1.
+        exclude = []
+        if (1 == e % 2):
+            exclude = [(e, (-k)*modinv(2, e) % e)]
+        p = first_prime(sieve_window(e*k + 1, 2*e, window, exclude), pool)
+        if (None != p):
+            return p
+
+# A good prime of exactly bits bits, with the top two bits set and
+# gcd(e, q-1) = 1.
+def generate_good_prime(bits, e, pool, rng=random, window=None):
+    if (None == window):
+        window = 2*bits
+    while True:
+        start = rng.getrandbits(bits - 2) | (3 << (bits - 2)) | 1
+        if (start + 2*window >= (1 << bits)):
+            continue
+        # q = 1 mod f for a prime factor f of e would make gcd(e, q-1) > 1.
+        exclude = [(f, (1 - start)*modinv(2, f) % f) for f in small_prime_factors(e) if (2 != f)]
+        q = first_prime(sieve_window(start, 2, window, exclude), pool)
+        if (None != q):
+            return q
+
+# An incorrectly generated key of bits bits for the public exponent e, in
+# the format of RSATestCases.make_incorrect_key.
+def generate_bad_key(bits, e, pool, rng=random):
+    pbits = bits//2
+    p = generate_bad_prime(pbits, e, pool, rng)
+    q = generate_good_prime(bits - pbits, e, pool, rng)
+    return RSATestCases.make_incorrect_key(p, q, p*q, e, bits)
+
+def key_to_json(key):
+    return json.dumps({"p":hex(key["p"]), "q":hex(key["q"]), "N":hex(key["N"]),
+                       "e":key["e"], "bitlength":key["bitlength"]})
+
+def main(argv):
+    parser = argparse.ArgumentParser(description="Generate incorrectly generated RSA keys with e | p-1.")
+    parser.add_argument("-o", "--output", required=True, help="JSON lines key file, appended to")
+    parser.add_argument("--bits", default="6144,8192", help="comma separated key sizes")
+    parser.add_argument("--count", type=int, default=1, help="keys per key size")
+    parser.add_argument("-e", type=int, default=65537, help="public exponent")
+    parser.add_argument("--workers", type=int, default=os.cpu_count(), help="worker processes")
+    parser.add_argument("--seed", type=int, help="seed for the candidate choice")
+    args = parser.parse_args(argv)
+
+    rng = random.Random(args.seed)
+    with Pool(processes=args.workers) as pool:
+        with open(args.output, "a") as f:
+            for bits in [int(b) for b in args.bits.split(",")]:
+                for _ in range(args.count):
+                    with Timer() as t:
+                        key = generate_bad_key(bits, args.e, pool, rng)
+                    f.write(key_to_json(key) + "\n")
+                    f.flush()
+                    print("Generated " + str(bits) + " bit key in " + "%.1f" % t.interval + " seconds.")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,64 @@
+#
+# RSABadKeyGenTest.py - Test for the incorrectly generated key generator
+#
+# Copyright (c) Microsoft Corporation. Licensed under the MIT license.
+#
+
+from RSABadKeyGen import *
+from RSAOAEPPlaintextSearch import *
+import RSABenchmark
+
+import tempfile
+
+def test_bad_key_gen(bits, e, pool, pt, hashfn):
+    rng = random.Random(bits)
+    key = generate_bad_key(bits, e, pool, rng)
+    (p, q, N) = (key["p"], key["q"], key["N"])
+
+    if ((bits != N.bit_length()) or (not miller_rabin(p)) or (not miller_rabin(q))):
+        print("Bad key size or primality FAILED.")
+        return False
+
+    if ((0 != (p-1) % e) or (0 == ((p-1)//e) % e) or (1 != math.gcd(e, q-1))):
+        print("Bad key structure FAILED.")
+        return False
+
+    with tempfile.TemporaryDirectory() as tmpdir:
+        path = os.path.join(tmpdir, "keys.jsonl")
+        with open(path, "w") as f:
+            f.write(key_to_json(key) + "\n")
+        keys = RSATestCases.load_bad_priv_keys(path)
+    if ([key] != keys):
+        print("Bad key file FAILED.")
+        return False
+
+    ct = int.from_bytes(RSAEncrypt_OAEP(pt, N, e, hashfn), 'big')
+    results = RSAOAEP_plaintext_search_iter(p, q, e, ct, hashfn, max_results=1)
+    if (pt not in [result.plaintext for result in results]):
+        print("Bad key plaintext search FAILED.")
+        return False
+
+    # The benchmarks run on generated keys too, also where d = e^-1 mod
+    # phi(N)/e does not exist.
+    results = {}
+    RSABenchmark.benchmark_key(key, [hashfn], 1, results)
+    has_d = (None != modinv(e, (p-1)*(q-1)//e))
+    if (((("private_op_noncrt/" + str(bits)) in results) != has_d) or
+        (("pkcs1_search/" + str(bits)) not in results)):
+        print("Bad key benchmark FAILED.")
+        return False
+
+    print("PASSED.")
+    return True
+
+if __name__ == "__main__":
+    pt = RSATestCases.pt[:16]
+
+    if ((not miller_rabin(RSATestCases.bad_p1)) or miller_rabin(RSATestCases.bad_N1) or
+        (small_primes(30) != [2, 3, 5, 7, 11, 13, 17, 19, 23, 29])):
+        print("Primality test FAILED.")
+
+    with Pool(processes=2) as pool:
+        for (bits, e) in [(512, 65537), (768, 15*65537), (1024, 3)]:
+            print("RSA bad key generation " + str(bits) + "bit test case with e = " + str(e) + ":\n")
+            test_bad_key_gen(bits, e, pool, pt, 'sha1')
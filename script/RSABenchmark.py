@@ -0,0 +1,161 @@
+#
+# RSABenchmark.py - Benchmarks of the plaintext search, private key operations
+#                   and padding functions over the keys in RSATestCases
+#
+# Copyright (c) Microsoft Corporation. Licensed under the MIT license.
+#
+# Usage:
+#   python RSABenchmark.py [--bits 1024,2048] [--hashes sha1,sha256] [--repeat 3]
+#                          [--keys keys.jsonl] [--history bench_history.jsonl]
+#                          [--baseline baseline.json] [--save-baseline]
+#
+# Every run is appended as one JSON line to the history file.  With
+# --baseline, each benchmark's median latency is compared against the stored
+# baseline and regressions beyond --threshold are reported (exit status 1).
+# --keys adds the keys of a key file written by RSABadKeyGen, for example
+# 6144 or 8192 bit keys.
+#
+
+from RSAOAEPPlaintextSearch import *
+from RSAPKCS1PlaintextSearch import *
+import RSATestCases
+import argparse
+import json
+import platform
+import sys
+import tracemalloc
+
+def percentile(sorted_values, fraction):
+    index = min(len(sorted_values) - 1, int(round(fraction*(len(sorted_values) - 1))))
+    return sorted_values[index]
+
+# Runs fn() repeat times and returns latency percentiles (seconds),
+# throughput (units per second, units per call given by units) and the peak
+# traced memory of one extra, untimed call.
+def run_benchmark(fn, repeat, units=1, inner=1):
+    latencies = []
+    for _ in range(repeat):
+        with Timer() as t:
+            for _ in range(inner):
+                fn()
+        latencies.append(t.interval/inner)
+    latencies.sort()
+
+    tracemalloc.start()
+    fn()
+    (_, peak) = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    mean = sum(latencies)/len(latencies)
+    return {"n":len(latencies), "mean":mean, "p50":percentile(latencies, 0.5),
+            "p90":percentile(latencies, 0.9), "p99":percentile(latencies, 0.99),
+            "throughput":units/mean, "peak_memory":peak}
+
+def benchmark_key(bad_prvk, hashes, repeat, results):
+    (p, q, N, e) = (bad_prvk["p"], bad_prvk["q"], bad_prvk["N"], bad_prvk["e"])
+    bits = str(bad_prvk["bitlength"])
+    pt = RSATestCases.pt
+    k = (N.bit_length() + 7)//8
+
+    results["key_context/" + bits] = run_benchmark(lambda: make_key_context(p, q, e), 1)
+    ctx = get_key_context(p, q, e)
+
+    # private key operations, with and without CRT.  d = e^-1 mod phi(N)/e
+    # only exists if e is prime to phi(N)/e, not for instance for e^2 | p-1
+    # or a composite e, and the keys without it only get the residues.
+    phihat_N = (p-1)*(q-1)//e
+    d = modinv(e, phihat_N)
+    ct = int.from_bytes(RSAEncrypt_PKCS1(pt, N, e), 'big')
+    if (None != d):
+        results["private_op_noncrt/" + bits] = run_benchmark(lambda: pow(ct, d, N), repeat)
+        results["private_op_crt/" + bits] = run_benchmark(lambda: rsa_crt_mod_exp(ct, d, p, q, ctx.Mp, ctx.Mq), repeat)
+    results["private_op_residues/" + bits] = run_benchmark(lambda: ctx.residues(ct), repeat)
+
+    results["pkcs1_search/" + bits] = run_benchmark(lambda: RSAPKCS1_plaintext_search_key(ctx, ct), repeat, ctx.r)
+    EM = RSAES_PKCS1_v15_Encode(N, e, pt)
+    results["pkcs1_encode/" + bits] = run_benchmark(lambda: RSAES_PKCS1_v15_Encode(N, e, pt), repeat, 1, 100)
+    results["pkcs1_decode/" + bits] = run_benchmark(lambda: RSAES_PKCS1_v15_Decode(EM), repeat, 1, 100)
+
+    for hashfn in hashes:
+        hLen = hashlib.new(hashfn).digest_size
+        if (len(pt) >= (k - 2*(hLen+1))):
+            continue
+        name = bits + "/" + hashfn
+        ct = int.from_bytes(RSAEncrypt_OAEP(pt, N, e, hashfn), 'big')
+        results["oaep_search/" + name] = run_benchmark(lambda: RSAOAEP_plaintext_search_key(ctx, ct, hashfn), repeat, ctx.r)
+        EM = RSAES_OAEP_EME_Encode(N, e, pt, None, hashfn)
+        results["oaep_encode/" + name] = run_benchmark(lambda: RSAES_OAEP_EME_Encode(N, e, pt, None, hashfn), repeat, 1, 100)
+        results["oaep_decode/" + name] = run_benchmark(lambda: RSAES_OAEP_EME_Decode(N, EM, None, hashfn), repeat, 1, 100)
+        results["oaep_decode_fail_fast/" + name] = run_benchmark(lambda: RSAES_OAEP_EME_Decode(N, b'\x00' + EM[1:-1] + b'\x00', None, hashfn, fail_fast=True), repeat, 1, 100)
+        seed = EM[1:hLen+1]
+        results["mgf1/" + name] = run_benchmark(lambda: RSAES_PKCS1_v22_OAEP_MGF1(seed, k-hLen-1, hashfn), repeat, k-hLen-1, 100)
+
+def compare_to_baseline(results, baseline, threshold):
+    regressions = []
+    for (name, result) in sorted(results.items()):
+        if (name not in baseline):
+            continue
+        ratio = result["p50"]/baseline[name]["p50"]
+        status = ""
+        if (ratio > 1.0 + threshold):
+            status = "  REGRESSION"
+            regressions.append(name)
+        print(name + ": " + "%.3fx" % ratio + " of baseline" + status)
+    return regressions
+
+def main(argv):
+    parser = argparse.ArgumentParser(description="Benchmark the RSA plaintext search over RSATestCases.")
+    parser.add_argument("--bits", help="comma separated key sizes to run (default: all)")
+    parser.add_argument("--hashes", help="comma separated OAEP hashes to run (default: all allowed_hashes)")
+    parser.add_argument("--repeat", type=int, default=3, help="timed runs per benchmark")
+    parser.add_argument("--keys", help="JSON lines key file from RSABadKeyGen to benchmark as well")
+    parser.add_argument("--history", default="bench_history.jsonl", help="JSON lines file the run is appended to")
+    parser.add_argument("--baseline", help="JSON file with the baseline results to compare against")
+    parser.add_argument("--save-baseline", action="store_true", help="write this run's results to --baseline")
+    parser.add_argument("--threshold", type=float, default=0.10, help="allowed median slow down before a regression is reported")
+    args = parser.parse_args(argv)
+    if (args.save_baseline and (None == args.baseline)):
+        parser.error("--save-baseline requires --baseline")
+
+    keys = RSATestCases.bad_priv_keys
+    if (None != args.keys):
+        keys = keys + RSATestCases.load_bad_priv_keys(args.keys)
+    if (None != args.bits):
+        bits = [int(b) for b in args.bits.split(",")]
+        keys = [k for k in keys if (k["bitlength"] in bits)]
+    hashes = sorted(allowed_hashes)
+    if (None != args.hashes):
+        hashes = args.hashes.split(",")
+
+    results = {}
+    for bad_prvk in keys:
+        print("Benchmarking " + str(bad_prvk["bitlength"]) + " bit key...")
+        benchmark_key(bad_prvk, hashes, args.repeat, results)
+
+    for (name, result) in sorted(results.items()):
+        print(name + ": p50 " + "%.6f" % result["p50"] + " s, p90 " + "%.6f" % result["p90"] +
+              " s, " + "%.1f" % result["throughput"] + "/s, peak " + str(result["peak_memory"]) + " bytes")
+
+    run = {"timestamp":time.time(), "python":platform.python_version(),
+           "machine":platform.machine(), "repeat":args.repeat, "results":results}
+    with open(args.history, "a") as f:
+        f.write(json.dumps(run) + "\n")
+
+    if (None == args.baseline):
+        return 0
+
+    if (args.save_baseline):
+        with open(args.baseline, "w") as f:
+            json.dump(results, f, indent=1)
+        return 0
+
+    with open(args.baseline, "r") as f:
+        baseline = json.load(f)
+    regressions = compare_to_baseline(results, baseline, args.threshold)
+    if (0 != len(regressions)):
+        print(str(len(regressions)) + " benchmarks regressed.")
+        return 1
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
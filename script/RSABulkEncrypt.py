@@ -0,0 +1,178 @@
+#
+# RSABulkEncrypt.py - Multi-process bulk encryption, for generating large
+#                     ciphertext corpora under the keys in RSATestCases
+#
+# Copyright (c) Microsoft Corporation. Licensed under the MIT license.
+#
+# Usage:
+#   python RSABulkEncrypt.py -o cts.bin [--metadata cts.jsonl] [--bits 1024]
+#                            [--count 100000] [--msglen 32]
+#                            [--scheme pkcs1|oaep] [--hash sha256]
+#                            [--workers N] [--chunk-size 1024]
+#
+# The ciphertexts are written back to back as k byte blocks, in message
+# order, so the output can be read back with RSACiphertextInput.  The
+# metadata file has one JSON line per message with its index, scheme, hash,
+# padding length and plaintext.
+#
+
+from RSAMath import *
+from RSAPadding import *
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+import RSATestCases
+import argparse
+import json
+import os
+import sys
+
+default_chunk_size = 1024
+
+# Worker side: encrypts one chunk of messages starting at message number
+# start.  If messages is None, count random messages of msglen bytes are
+# generated in the worker.  Returns (start, ciphertexts, metadata) where
+# ciphertexts holds the k byte ciphertexts back to back.
+def bulk_encrypt_chunk(args):
+    (N, e, scheme, hashfn, start, messages, count, msglen) = args
+    k = (N.bit_length() + 7)//8
+
+    if (None == messages):
+        messages = [os.urandom(msglen) for _ in range(count)]
+
+    if ("oaep" == scheme):
+        codec = OAEPCodec(N, hashfn)
+        encode = codec.encode
+        hLen = codec.hLen
+    else:
+        encode = lambda M: RSAES_PKCS1_v15_Encode(N, e, M)
+
+    out = bytearray(len(messages)*k)
+    metadata = []
+    for (i, M) in enumerate(messages):
+        EM = encode(M)
+        ct = pow(int.from_bytes(EM, 'big'), e, N)
+        out[i*k:(i+1)*k] = ct.to_bytes(k, 'big')
+        record = {"index":start + i, "scheme":scheme, "plaintext":M.hex()}
+        if ("oaep" == scheme):
+            record["hash"] = hashfn
+            record["paddinglength"] = k - len(M) - 2*hLen - 2
+        else:
+            record["paddinglength"] = k - len(M) - 3
+        metadata.append(record)
+
+    return (start, bytes(out), metadata)
+
+def _check_scheme(scheme, hashfn):
+    if (scheme not in ("pkcs1", "oaep")):
+        raise ValueError("Padding scheme must be pkcs1 or oaep.")
+    if (("oaep" == scheme) and (str != type(hashfn))):
+        raise TypeError("Hash function argument hashfn must be type str.")
+
+# Submits fn(item) to executor for the items in order and yields the
+# results in the same order, with at most window items in flight, so that
+# neither the submitted chunks nor their results pile up.
+def _map_window(executor, fn, items, window):
+    pending = deque()
+    try:
+        for item in items:
+            pending.append(executor.submit(fn, item))
+            if (len(pending) >= window):
+                yield pending.popleft().result()
+        while (0 != len(pending)):
+            yield pending.popleft().result()
+    finally:
+        for future in pending:
+            future.cancel()
+
+# Runs the chunks on executor, or on a new pool of workers processes, and
+# yields the results in chunk order, with 2*workers chunks in flight.
+def _map_chunks(chunks, workers, executor):
+    if (None == workers):
+        workers = os.cpu_count()
+    if (None != executor):
+        yield from _map_window(executor, bulk_encrypt_chunk, chunks, 2*workers)
+        return
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        yield from _map_window(pool, bulk_encrypt_chunk, chunks, 2*workers)
+
+# Encrypts the list of messages under (N, e) on a process pool.  The
+# ciphertexts are written back to back into out, a writable buffer of at
+# least len(messages)*k bytes (for example a bytearray or an mmap), or into
+# a new bytearray.  Returns (out, metadata) with one metadata dict per
+# message, in order.
+def bulk_encrypt(N, e, messages, scheme, hashfn=None, workers=None,
+                 chunk_size=default_chunk_size, executor=None, out=None):
+    _check_scheme(scheme, hashfn)
+
+    k = (N.bit_length() + 7)//8
+    if (None == out):
+        out = bytearray(len(messages)*k)
+    if (len(out) < len(messages)*k):
+        raise ValueError("Output buffer is too small for " + str(len(messages)) + " ciphertexts.")
+
+    chunks = [(N, e, scheme, hashfn, start, messages[start:start+chunk_size], 0, 0)
+              for start in range(0, len(messages), chunk_size)]
+
+    metadata = []
+    for (start, cts, chunk_metadata) in _map_chunks(chunks, workers, executor):
+        out[start*k:start*k + len(cts)] = cts
+        metadata.extend(chunk_metadata)
+
+    return (out, metadata)
+
+# Encrypts count random messages of msglen bytes under (N, e) and writes the
+# ciphertexts to path, with the metadata as JSON lines in metadata_path if
+# given.  The messages are generated in the workers, so the memory used
+# does not grow with count.  Returns the number of ciphertexts written.
+def bulk_encrypt_file(path, N, e, count, msglen, scheme, hashfn=None, metadata_path=None,
+                      workers=None, chunk_size=default_chunk_size, executor=None):
+    _check_scheme(scheme, hashfn)
+
+    chunks = ((N, e, scheme, hashfn, start, None, min(chunk_size, count - start), msglen)
+              for start in range(0, count, chunk_size))
+
+    meta = None
+    if (None != metadata_path):
+        meta = open(metadata_path, "w")
+    written = 0
+    try:
+        with open(path, "wb") as f:
+            for (start, cts, chunk_metadata) in _map_chunks(chunks, workers, executor):
+                f.write(cts)
+                if (None != meta):
+                    meta.write("".join([json.dumps(record) + "\n" for record in chunk_metadata]))
+                written = written + len(chunk_metadata)
+    finally:
+        if (None != meta):
+            meta.close()
+
+    return written
+
+def main(argv):
+    parser = argparse.ArgumentParser(description="Encrypt random messages under a key from RSATestCases.")
+    parser.add_argument("-o", "--output", required=True, help="ciphertext output file")
+    parser.add_argument("--metadata", help="JSON lines metadata output file")
+    parser.add_argument("--bits", type=int, default=1024, help="bit length of the RSATestCases bad key")
+    parser.add_argument("--count", type=int, default=100000, help="number of messages")
+    parser.add_argument("--msglen", type=int, default=32, help="message length in bytes")
+    parser.add_argument("--scheme", default="pkcs1", choices=["pkcs1", "oaep"], help="padding scheme")
+    parser.add_argument("--hash", default="sha256", help="OAEP hash function")
+    parser.add_argument("--workers", type=int, default=os.cpu_count(), help="worker processes")
+    parser.add_argument("--chunk-size", type=int, default=default_chunk_size, help="messages per work item")
+    args = parser.parse_args(argv)
+
+    keys = [k for k in RSATestCases.bad_priv_keys if (args.bits == k["bitlength"])]
+    if (0 == len(keys)):
+        print("ERROR: no " + str(args.bits) + " bit key in RSATestCases.")
+        return 1
+    (N, e) = (keys[0]["N"], keys[0]["e"])
+
+    with Timer() as t:
+        written = bulk_encrypt_file(args.output, N, e, args.count, args.msglen, args.scheme, args.hash,
+                                    args.metadata, args.workers, args.chunk_size)
+    print("Encrypted " + str(written) + " messages in " + str(t.interval) + " seconds (" +
+          "%.1f" % (written/t.interval) + "/s).")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,81 @@
+#
+# RSABulkEncryptTest.py - Test for the multi-process bulk encryption
+#
+# Copyright (c) Microsoft Corporation. Licensed under the MIT license.
+#
+
+from RSABulkEncrypt import *
+from RSACiphertextInput import *
+from RSAOAEPPlaintextSearch import *
+from RSAPKCS1PlaintextSearch import *
+
+from concurrent.futures import ThreadPoolExecutor
+import RSABulkEncrypt
+import tempfile
+
+def recovered(ctx, ct, scheme, hashfn, M):
+    if ("oaep" == scheme):
+        results = RSAOAEP_plaintext_search_key_iter(ctx, ct, hashfn)
+    else:
+        results = RSAPKCS1_plaintext_search_key_iter(ctx, ct)
+    return M in [result.plaintext for result in results]
+
+def test_bulk_encrypt(bad_prvk, hashfn, executor):
+    (p, q, N, e) = (bad_prvk["p"], bad_prvk["q"], bad_prvk["N"], bad_prvk["e"])
+    k = (N.bit_length() + 7)//8
+    ctx = get_key_context(p, q, e)
+
+    messages = [os.urandom(i) for i in range(5)]
+    for scheme in ["pkcs1", "oaep"]:
+        (out, metadata) = bulk_encrypt(N, e, messages, scheme, hashfn, chunk_size=2, executor=executor)
+        if ((len(messages)*k != len(out)) or ([r["index"] for r in metadata] != list(range(len(messages))))):
+            print("Bulk encrypt " + scheme + " output FAILED.")
+            return False
+        ct = int.from_bytes(out[3*k:4*k], 'big')
+        if (not recovered(ctx, ct, scheme, hashfn, messages[3])):
+            print("Bulk encrypt " + scheme + " ciphertext FAILED.")
+            return False
+
+    with tempfile.TemporaryDirectory() as tmpdir:
+        path = os.path.join(tmpdir, "cts.bin")
+        metadata_path = os.path.join(tmpdir, "cts.jsonl")
+        written = bulk_encrypt_file(path, N, e, 7, 16, "oaep", hashfn, metadata_path,
+                                    chunk_size=3, executor=executor)
+        with open(metadata_path, "r") as f:
+            metadata = [json.loads(line) for line in f]
+        cts = list(ciphertext_ints(path, k, "raw", N))
+        if ((7 != written) or (7 != len(cts)) or (7 != len(metadata)) or
+            (not recovered(ctx, cts[6], "oaep", hashfn, bytes.fromhex(metadata[6]["plaintext"])))):
+            print("Bulk encrypt file FAILED.")
+            return False
+
+    print("PASSED.")
+    return True
+
+# The chunks are submitted as the results are taken, never more than the
+# window ahead.
+def test_map_window():
+    submitted = []
+    def chunks():
+        for i in range(10):
+            submitted.append(i)
+            yield i
+    with ThreadPoolExecutor(max_workers=2) as executor:
+        results = []
+        for result in RSABulkEncrypt._map_window(executor, lambda i: i*i, chunks(), 3):
+            if (len(submitted) > len(results) + 3):
+                print("Bulk encrypt bounded window FAILED.")
+                return False
+            results.append(result)
+    if ([i*i for i in range(10)] != results):
+        print("Bulk encrypt window order FAILED.")
+        return False
+    print("PASSED.")
+    return True
+
+if __name__ == "__main__":
+    with ProcessPoolExecutor(max_workers=2) as executor:
+        bad_prvk = RSATestCases.bad_priv_keys[0]
+        print("RSA bulk encryption " + str(bad_prvk["bitlength"]) + "bit test case:\n")
+        test_bulk_encrypt(bad_prvk, "sha256", executor)
+    test_map_window()
@@ -0,0 +1,150 @@
+#
+# RSACiphertextInput.py - Memory mapped reading of ciphertext files
+#
+# Copyright (c) Microsoft Corporation. Licensed under the MIT license.
+#
+# Three input formats are supported:
+#   raw - a dump of fixed size ciphertext blocks of bytelen bytes each
+#   der - DER encoded OCTET STRINGs or BIT STRINGs holding one ciphertext
+#         each, optionally nested in SEQUENCEs
+#   pem - base64 PEM blocks, each holding one raw ciphertext or DER as above
+#
+# The file is memory mapped and the ciphertexts are yielded one at a time, as
+# memoryview slices of the map (raw and der) or as ints, so the memory used
+# does not grow with the size of the file.  To keep it so for the search,
+# pass ciphertext_ints to the *_plaintext_search_batch_iter functions, which
+# search one ciphertext at a time, instead of the list returning *_batch.
+#
+
+from RSAMath import *
+import base64
+import mmap
+import os
+
+def _open_map(path):
+    with open(path, "rb") as f:
+        if (0 == os.fstat(f.fileno()).st_size):
+            return None
+        return mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+def _close_map(mm):
+    try:
+        mm.close()
+    except BufferError:
+        # the caller still holds a slice, the map is closed with it
+        pass
+
+# Returns (content offset, content length) of the DER element at offset.
+def _der_header(buf, offset, end):
+    if (offset + 2 > end):
+        raise ValueError("Truncated DER element at offset " + str(offset) + ".")
+    length = buf[offset+1]
+    offset = offset + 2
+    if (0x80 <= length):
+        nbytes = length & 0x7f
+        if ((0 == nbytes) or (offset + nbytes > end)):
+            raise ValueError("Bad DER length at offset " + str(offset) + ".")
+        length = int.from_bytes(buf[offset:offset+nbytes], 'big')
+        offset = offset + nbytes
+    if (offset + length > end):
+        raise ValueError("Truncated DER element at offset " + str(offset) + ".")
+    return (offset, length)
+
+def _der_blocks(view, start, end, bytelen):
+    offset = start
+    while (offset < end):
+        tag = view[offset]
+        (content, length) = _der_header(view, offset, end)
+        if (0x30 == tag):
+            yield from _der_blocks(view, content, content + length, bytelen)
+        elif (0x04 == tag):
+            yield _check_block(view[content:content+length], bytelen)
+        elif ((0x03 == tag) and (0 < length) and (0 == view[content])):
+            yield _check_block(view[content+1:content+length], bytelen)
+        else:
+            raise ValueError("Unexpected DER tag " + hex(tag) + " at offset " + str(offset) + ".")
+        offset = content + length
+
+def _check_block(block, bytelen):
+    if (bytelen != len(block)):
+        raise ValueError("Ciphertext length " + str(len(block)) + " does not match the key byte length " + str(bytelen) + ".")
+    return block
+
+def _pem_blocks(mm, bytelen):
+    body = None
+    for line in iter(mm.readline, b""):
+        line = line.strip()
+        if (line.startswith(b"-----BEGIN")):
+            body = []
+        elif (line.startswith(b"-----END")):
+            if (None == body):
+                raise ValueError("PEM END line without BEGIN.")
+            der = base64.b64decode(b"".join(body), validate=True)
+            body = None
+            if (bytelen == len(der)):
+                yield der
+            else:
+                yield from _der_blocks(memoryview(der), 0, len(der), bytelen)
+        elif ((None != body) and (0 != len(line)) and (b":" not in line)):
+            body.append(line)
+    if (None != body):
+        raise ValueError("PEM block without END line.")
+
+# Guesses the format from the start of the map: PEM if it begins with a
+# BEGIN line, DER if the first element spans the whole file, else raw.
+def detect_ciphertext_format(mm):
+    head = mm[:64].lstrip()
+    if (head.startswith(b"-----BEGIN")):
+        return "pem"
+    if ((2 <= len(mm)) and (mm[0] in (0x30, 0x04))):
+        try:
+            (content, length) = _der_header(mm, 0, len(mm))
+            if (content + length == len(mm)):
+                return "der"
+        except ValueError:
+            pass
+    return "raw"
+
+# Yields the ciphertexts in the file at path as bytes-like objects of
+# bytelen bytes: memoryview slices of the mapped file for raw and DER input,
+# bytes for PEM.  The slices are valid for as long as they are referenced.
+# fmt is "raw", "der", "pem" or "auto".  Raises ValueError if a ciphertext
+# does not have the key byte length.
+def ciphertext_blocks(path, bytelen, fmt="auto"):
+    if (fmt not in ("auto", "raw", "der", "pem")):
+        raise ValueError("Ciphertext format must be auto, raw, der or pem.")
+
+    mm = _open_map(path)
+    if (None == mm):
+        return
+
+    try:
+        if ("auto" == fmt):
+            fmt = detect_ciphertext_format(mm)
+
+        if ("pem" == fmt):
+            yield from _pem_blocks(mm, bytelen)
+            return
+
+        view = memoryview(mm)
+        try:
+            if ("der" == fmt):
+                yield from _der_blocks(view, 0, len(view), bytelen)
+            else:
+                if (0 != len(view) % bytelen):
+                    raise ValueError("File size " + str(len(view)) + " is not a multiple of the key byte length " + str(bytelen) + ".")
+                for offset in range(0, len(view), bytelen):
+                    yield view[offset:offset+bytelen]
+        finally:
+            view.release()
+    finally:
+        _close_map(mm)
+
+# Same as ciphertext_blocks, but yields the ciphertexts as ints.  If N is
+# given, ciphertexts that are not smaller than N raise ValueError.
+def ciphertext_ints(path, bytelen, fmt="auto", N=None):
+    for block in ciphertext_blocks(path, bytelen, fmt):
+        ct = int.from_bytes(block, 'big')
+        if ((None != N) and (ct >= N)):
+            raise ValueError("Ciphertext is not smaller than the modulus.")
+        yield ct
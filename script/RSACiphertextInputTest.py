@@ -0,0 +1,76 @@
+#
+# RSACiphertextInputTest.py - Test for the memory mapped ciphertext input
+#
+# Copyright (c) Microsoft Corporation. Licensed under the MIT license.
+#
+
+from RSACiphertextInput import *
+from RSAPKCS1PlaintextSearch import *
+
+import RSATestCases
+import tempfile
+
+def der_octet_string(data):
+    if (128 > len(data)):
+        return b'\x04' + bytes([len(data)]) + data
+    length = len(data).to_bytes((len(data).bit_length() + 7)//8, 'big')
+    return b'\x04' + bytes([0x80 | len(length)]) + length + data
+
+def der_sequence(data):
+    length = len(data).to_bytes((len(data).bit_length() + 7)//8, 'big')
+    return b'\x30' + bytes([0x80 | len(length)]) + length + data
+
+def test_ciphertext_input(bad_prvk, pt):
+    (p, q, N, e) = (bad_prvk["p"], bad_prvk["q"], bad_prvk["N"], bad_prvk["e"])
+    k = (N.bit_length() + 7)//8
+    cts = [RSAEncrypt_PKCS1(pt, N, e) for _ in range(3)]
+
+    der = der_sequence(b"".join([der_octet_string(ct) for ct in cts]))
+    pem = b"".join([b"-----BEGIN RSA CIPHERTEXT-----\n" + base64.encodebytes(ct) + b"-----END RSA CIPHERTEXT-----\n"
+                    for ct in cts])
+    files = {"raw":b"".join(cts), "der":der, "pem":pem}
+
+    with tempfile.TemporaryDirectory() as tmpdir:
+        for (fmt, data) in files.items():
+            path = os.path.join(tmpdir, "cts." + fmt)
+            with open(path, "wb") as f:
+                f.write(data)
+
+            with open(path, "rb") as f:
+                mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+                detected = detect_ciphertext_format(mm)
+                mm.close()
+            if (fmt != detected):
+                print("Ciphertext format detection " + fmt + " FAILED.")
+                return False
+
+            if (cts != [bytes(block) for block in ciphertext_blocks(path, k)]):
+                print("Ciphertext blocks " + fmt + " FAILED.")
+                return False
+
+        path = os.path.join(tmpdir, "cts.raw")
+        pt_lists = RSAPKCS1_plaintext_search_batch_iter(p, q, e, ciphertext_ints(path, k, "raw", N))
+        if (not all([pt in [int.to_bytes(d["plaintext"], d["plaintextlength"], 'big') for d in pt_list]
+                     for pt_list in pt_lists])):
+            print("Search over ciphertext file FAILED.")
+            return False
+
+        path = os.path.join(tmpdir, "short.raw")
+        with open(path, "wb") as f:
+            f.write(b"".join(cts)[:-1])
+        try:
+            list(ciphertext_blocks(path, k, "raw"))
+            print("Short ciphertext file check FAILED.")
+            return False
+        except ValueError:
+            pass
+
+    print("PASSED.")
+    return True
+
+if __name__ == "__main__":
+    pt = RSATestCases.pt
+
+    bad_prvk = RSATestCases.bad_priv_keys[0]
+    print("RSA ciphertext input " + str(bad_prvk["bitlength"]) + "bit test case:\n")
+    test_ciphertext_input(bad_prvk, pt)
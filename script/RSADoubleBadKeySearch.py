@@ -0,0 +1,220 @@
+#
+# RSADoubleBadKeySearch.py - Plaintext search for keys where the public
+#                            exponent shares a factor with both p-1 and q-1
+#
+# Copyright (c) Microsoft Corporation. Licensed under the MIT license.
+#
+# A ciphertext has rp = gcd(e, p-1) e-th roots modulo p and rq = gcd(e, q-1)
+# modulo q, so there are rp*rq candidate plaintexts x = xq + q*t with
+# t = (xp - xq)*qinv mod p.  Writing
+# u_i = xp_i*qinv mod p and s_j = xq_j*qinv mod p, a padding prefix bound
+# lo <= x < hi is a range of t, which for each root xq_j is a range of u_i
+# modulo p.  The u_i are sorted once, and each j only visits the u_i inside
+# its range, so the work is about (rp + rq)*log(rp) plus the number of
+# candidates that pass the prefix check, instead of rp*rq.
+#
+
+from RSAMath import *
+from RSAOAEPPlaintextSearch import *
+from RSAPKCS1PlaintextSearch import *
+from concurrent.futures import ProcessPoolExecutor, as_completed
+import bisect
+import json
+import os
+
+default_chunk_size = 1024
+
+def rsa_double_bad_key_precompute(p, q, e):
+    if ((1 == math.gcd(e, p-1)) or (1 == math.gcd(e, q-1))):
+        print("ERROR: the public exponent does not share a factor with both p-1 and q-1.")
+        return None
+
+    N = p*q
+    (root_p, root_q) = (EthRootContext(p, e), EthRootContext(q, e))
+    (rp, rq) = (root_p.r, root_q.r)
+
+    zeta_p = find_root_of_unity(rp, p)
+    zeta_q = find_root_of_unity(rq, q)
+    if ((None == zeta_p) or (None == zeta_q)):
+        return None
+
+    return {"p":p, "q":q, "N":N, "e":e, "rp":rp, "rq":rq,
+            "root_p":root_p, "root_q":root_q, "zeta_p":zeta_p, "zeta_q":zeta_q,
+            "qinv":modinv(q,p), "bytelen":(N.bit_length() + 7)//8}
+
+# Sorted (u_i, i) for all rp roots modulo p, see the header comment.
+def double_bad_key_sorted_roots(key, ct):
+    p = key["p"]
+    us = []
+    zp = key["root_p"].root(ct)
+    if (None == zp):
+        return us
+    u = zp*key["qinv"] % p
+    for i in range(key["rp"]):
+        us.append((u, i))
+        u = u*key["zeta_p"] % p
+    us.sort()
+    return us
+
+def double_bad_key_prefix_range(scheme, bytelen):
+    if ("pkcs1" == scheme):
+        return RSAES_PKCS1_v15_EM_range(bytelen)
+    return RSAES_OAEP_EM_range(bytelen)
+
+# Worker state, set once per process by double_bad_key_worker_init.
+_worker_state = {}
+
+def double_bad_key_worker_init(key, ct, scheme, hashfn, us):
+    _worker_state["key"] = key
+    _worker_state["ct"] = ct
+    _worker_state["scheme"] = scheme
+    _worker_state["hashfn"] = hashfn
+    _worker_state["us"] = us
+    _worker_state["ukeys"] = [u for (u, i) in us]
+
+# Scans the roots modulo q with index in [start, stop) against every root
+# modulo p.  Returns (start, [((i, j), pt_dict), ...]).
+def double_bad_key_scan_chunk(start, stop):
+    key = _worker_state["key"]
+    scheme = _worker_state["scheme"]
+    hashfn = _worker_state["hashfn"]
+    us = _worker_state["us"]
+    ukeys = _worker_state["ukeys"]
+
+    (p, q, N, bytelen) = (key["p"], key["q"], key["N"], key["bytelen"])
+    (lo, hi) = double_bad_key_prefix_range(scheme, bytelen)
+    codec = None
+    if ("oaep" == scheme):
+        codec = OAEPCodec(N, hashfn)
+
+    zeta_q = key["zeta_q"]
+    xq = key["root_q"].root(_worker_state["ct"])
+    if ((None == xq) or (0 == len(us))):
+        return (start, [])
+    xq = xq*pow(zeta_q, start, q) % q
+
+    found = []
+    for j in range(start, stop):
+        s = xq*key["qinv"] % p
+        (tlo, thi) = rsa_garner_range(xq, q, p, lo, hi)
+        if (tlo < thi):
+            # u - s mod p in [tlo, thi), as one or two ranges of u
+            a = (s + tlo) % p
+            b = a + (thi - tlo)
+            if (b <= p):
+                ranges = [(a, b)]
+            else:
+                ranges = [(a, p), (0, b - p)]
+            for (ua, ub) in ranges:
+                for idx in range(bisect.bisect_left(ukeys, ua), bisect.bisect_left(ukeys, ub)):
+                    (u, i) = us[idx]
+                    t = u - s
+                    if (t < 0):
+                        t = t + p
+                    pt_hat = xq + q*t
+                    if ("pkcs1" == scheme):
+                        pt_dict = RSAPKCS1_check_candidate(pt_hat, bytelen)
+                    else:
+                        pt_dict = RSAOAEP_check_candidate(pt_hat, N, bytelen, hashfn, codec=codec)
+                    if (None != pt_dict):
+                        found.append(((i, j), pt_dict))
+        xq = xq*zeta_q % q
+
+    return (start, found)
+
+# The checkpoint is a JSON lines file: a header line with the search
+# arguments, then one line per finished chunk with its results.  Lines are
+# only appended, so an interrupted write can only lose the last chunk.  A
+# missing or empty file, or one whose header line was torn before it was
+# complete, is a fresh start and gets a new header.
+def _load_checkpoint(checkpoint, job):
+    (done, found) = (set(), [])
+    if (None == checkpoint):
+        return (done, found)
+    with open(checkpoint, "a+b") as f:
+        f.seek(0)
+        lines = f.readlines()
+        header = None
+        if ((0 != len(lines)) and lines[0].endswith(b"\n")):
+            try:
+                header = json.loads(lines[0])
+            except ValueError:
+                pass
+        if (None == header):
+            f.truncate(0)
+            f.write((json.dumps(job) + "\n").encode())
+            f.flush()
+            os.fsync(f.fileno())
+            return (done, found)
+        if (header != job):
+            raise ValueError("Checkpoint file " + checkpoint + " belongs to a different search.")
+        good = len(lines[0])
+        for line in lines[1:]:
+            try:
+                chunk = json.loads(line)
+            except ValueError:
+                break
+            if (not line.endswith(b"\n")):
+                break
+            done.add(chunk["start"])
+            found.extend([((i, j), pt_dict) for ((i, j), pt_dict) in chunk["found"]])
+            good = good + len(line)
+        # drop a torn last line so that new chunks append cleanly
+        f.truncate(good)
+    return (done, found)
+
+def _append_checkpoint(checkpoint, record):
+    with open(checkpoint, "a") as f:
+        f.write(json.dumps(record) + "\n")
+        f.flush()
+        os.fsync(f.fileno())
+
+# Searches the rp*rq candidate plaintexts of ct for valid PKCS1 v1.5 ("pkcs1")
+# or OAEP ("oaep" with hashfn) padding.  The roots modulo q are split into
+# chunks of chunk_size and scanned on a process pool.  If checkpoint is a
+# file name, progress is saved there after each chunk and a later call with
+# the same arguments resumes from it.  Returns the plaintext dicts in
+# (i, j) candidate order.
+def RSA_double_bad_key_plaintext_search(p, q, e, ct, scheme, hashfn=None, workers=None,
+                                        chunk_size=default_chunk_size, checkpoint=None):
+    if (scheme not in ("pkcs1", "oaep")):
+        raise ValueError("Padding scheme must be pkcs1 or oaep.")
+    if (("oaep" == scheme) and (str != type(hashfn))):
+        raise TypeError("Hash function argument hashfn must be type str.")
+
+    key = rsa_double_bad_key_precompute(p, q, e)
+    if (None == key):
+        return None
+
+    job = {"p":str(p), "q":str(q), "e":e, "ct":str(ct), "scheme":scheme,
+           "hashfn":hashfn, "chunk_size":chunk_size}
+    (done, found) = _load_checkpoint(checkpoint, job)
+
+    rq = key["rq"]
+    starts = [start for start in range(0, rq, chunk_size) if (start not in done)]
+
+    if (0 != len(starts)):
+        print("Sorting roots modulo p...")
+        with Timer() as t:
+            us = double_bad_key_sorted_roots(key, ct)
+        print("Roots sorted in " + str(t.interval) + " seconds.")
+
+        if (None == workers):
+            workers = os.cpu_count()
+
+        print("Searching " + str(len(starts)) + " chunks for plaintext...")
+        with Timer() as t:
+            with ProcessPoolExecutor(max_workers=workers, initializer=double_bad_key_worker_init,
+                                     initargs=(key, ct, scheme, hashfn, us)) as pool:
+                futures = [pool.submit(double_bad_key_scan_chunk, start, min(start + chunk_size, rq))
+                           for start in starts]
+                for future in as_completed(futures):
+                    (start, chunk_found) = future.result()
+                    done.add(start)
+                    found.extend(chunk_found)
+                    if (None != checkpoint):
+                        _append_checkpoint(checkpoint, {"start":start, "found":chunk_found})
+        print("Plaintext search finished in " + str(t.interval) + " seconds.")
+
+    found.sort(key=lambda item: item[0])
+    return [pt_dict for (_, pt_dict) in found]
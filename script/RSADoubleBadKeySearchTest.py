@@ -0,0 +1,63 @@
+#
+# RSADoubleBadKeySearchTest.py - Test for the plaintext search when e divides
+#                                both p-1 and q-1
+#
+# Copyright (c) Microsoft Corporation. Licensed under the MIT license.
+#
+
+from RSADoubleBadKeySearch import *
+
+import RSATestCases
+import tempfile
+
+def test_double_bad_key_search(p, q, N, e, pt):
+    ct = int.from_bytes(RSAEncrypt_PKCS1(pt, N, e), 'big')
+    pti = int.from_bytes(pt, 'big')
+
+    checkpoint = os.path.join(tempfile.mkdtemp(), "checkpoint.json")
+    pt_list = RSA_double_bad_key_plaintext_search(p, q, e, ct, "pkcs1", checkpoint=checkpoint)
+    print("Found " + str(len(pt_list)) + " valid plaintext search.")
+    if (pti not in [pt_dict["plaintext"] for pt_dict in pt_list]):
+        print("Double bad key search FAILED.")
+        return False
+
+    # Drop half of the finished chunks from the checkpoint and leave a torn
+    # last line, as if the search had been interrupted, and resume it.
+    with open(checkpoint, "r") as f:
+        lines = f.readlines()
+    with open(checkpoint, "w") as f:
+        f.writelines(lines[0:1] + lines[1::2])
+        f.write(lines[2][:len(lines[2])//2])
+
+    if (pt_list != RSA_double_bad_key_plaintext_search(p, q, e, ct, "pkcs1", checkpoint=checkpoint)):
+        print("Double bad key search resume FAILED.")
+        return False
+
+    # The resumed search completed the checkpoint, so nothing is left to scan.
+    if (pt_list != RSA_double_bad_key_plaintext_search(p, q, e, ct, "pkcs1", checkpoint=checkpoint)):
+        print("Double bad key search resume FAILED.")
+        return False
+
+    # A checkpoint torn inside its header line is a fresh start.
+    with open(checkpoint, "w") as f:
+        f.write(lines[0][:len(lines[0])//2])
+    if (pt_list != RSA_double_bad_key_plaintext_search(p, q, e, ct, "pkcs1", checkpoint=checkpoint)):
+        print("Double bad key search torn header FAILED.")
+        return False
+
+    # The checkpoint of another search is left alone.
+    try:
+        RSA_double_bad_key_plaintext_search(p, q, e, ct + 1, "pkcs1", checkpoint=checkpoint)
+        print("Double bad key search checkpoint mismatch FAILED.")
+        return False
+    except ValueError:
+        pass
+
+    print("PASSED.")
+    return True
+
+if __name__ == "__main__":
+    for bad_prvk in RSATestCases.double_bad_priv_keys:
+        print("RSA PKCS1 double bad key plaintext search " + str(bad_prvk["bitlength"]) + "bit test case:\n")
+        test_double_bad_key_search(bad_prvk["p"], bad_prvk["q"], bad_prvk["N"], bad_prvk["e"], RSATestCases.pt)
+        print("\n\n")
@@ -0,0 +1,177 @@
+#
+# RSAKeyContext.py - Per-key precomputation and roots of unity table for the
+#                    plaintext search, with a process wide LRU cache
+#
+# Copyright (c) Microsoft Corporation. Licensed under the MIT license.
+#
+
+from RSAMath import *
+from collections import OrderedDict
+import threading
+
+# The size in bytes of the roots table of a KeyContext for key.
+def key_context_table_nbytes(key):
+    return key["r"]*((key["p"].bit_length() + 7)//8)
+
+class KeyContext:
+    # Without table the roots of unity are not stored but chained, one
+    # multiplication per candidate as with the table, so that keys whose
+    # table would not fit into memory can still be searched.
+    def __init__(self, key, table=True):
+        # the rsa_bad_key_precompute dict this context was built from
+        self.key = key
+        self.p = key["p"]
+        self.q = key["q"]
+        self.N = key["N"]
+        self.e = key["e"]
+        # number of candidates, gcd(e, p-1) for the bad prime p
+        self.r = key["r"]
+        # CRT split of the decrypt exponent, and the CRT constants
+        self.dp = key["dp"]
+        self.dq = key["dq"]
+        self.Mp = key["Mp"]
+        self.Mq = key["Mq"]
+        self.qinv = key["qinv"]
+        self.g_e_torsion = key["g_e_torsion"]
+        self.bytelen = key["bytelen"]
+
+        # The r-th roots of unity modulo the bad prime p, packed as fixed
+        # width big endian integers in a single buffer.  Entry i is
+        # g_e_torsion^i mod p.  None without table.
+        self.width = (self.p.bit_length() + 7)//8
+        width = self.width
+        self.roots = None
+        if (not table):
+            return
+        roots = bytearray(self.r*width)
+        ell = 1
+        for i in range(self.r):
+            roots[i*width:(i+1)*width] = ell.to_bytes(width, 'big')
+            ell = ell*self.g_e_torsion % self.p
+        self.roots = roots
+
+    def nbytes(self):
+        if (None == self.roots):
+            return 0
+        return len(self.roots)
+
+    def root(self, i):
+        if (None == self.roots):
+            return pow(self.g_e_torsion, i, self.p)
+        width = self.width
+        return int.from_bytes(self.roots[i*width:(i+1)*width], 'big')
+
+    def residues(self, ct):
+        return rsa_bad_key_residues(self.key, ct)
+
+    # Same candidates as rsa_bad_key_candidates, but any index range can be
+    # generated directly from the table with one multiplication each.
+    def candidates(self, ct, start=0, stop=None, lo=0, hi=None):
+        (zp, xq) = self.residues(ct)
+        return self.scan(zp, xq, start, stop, lo, hi)
+
+    def scan(self, zp, xq, start=0, stop=None, lo=0, hi=None):
+        p = self.p
+        q = self.q
+        width = self.width
+
+        if (None == stop):
+            stop = self.r
+
+        if (None == zp):
+            return
+
+        c = zp*self.qinv % p
+        s = xq*self.qinv % p
+        (tlo, thi) = rsa_garner_range(xq, q, p, lo, hi)
+
+        if (None == self.roots):
+            g = self.g_e_torsion
+            u = pow(g, start, p)*c % p
+            for i in range(start, stop):
+                t = u - s
+                if (t < 0):
+                    t = t + p
+                if ((tlo <= t) and (t < thi)):
+                    yield (i, xq + q*t)
+                u = u*g % p
+            return
+
+        roots = memoryview(self.roots)
+        for i in range(start, stop):
+            t = int.from_bytes(roots[i*width:(i+1)*width], 'big')*c % p - s
+            if (t < 0):
+                t = t + p
+            if ((tlo <= t) and (t < thi)):
+                yield (i, xq + q*t)
+
+# Builds the KeyContext of a key, without roots table if the table would
+# take more than max_table_bytes (default no limit).
+def make_key_context(p, q, e, metrics=None, max_table_bytes=None):
+    if (None == metrics):
+        metrics = SearchMetrics()
+    key = rsa_bad_key_precompute(p, q, e, metrics)
+    if (None == key):
+        return None
+    table = ((None == max_table_bytes) or (key_context_table_nbytes(key) <= max_table_bytes))
+    with metrics.phase("roots table"):
+        ctx = KeyContext(key, table)
+    return ctx
+
+
+# Process wide cache of key contexts, least recently used first.  A 4096-bit
+# key with e = 2^16+1 needs about 16 MB of roots table.
+
+key_context_cache_budget = 256*1024*1024
+
+_key_context_cache = OrderedDict()
+_key_context_cache_bytes = 0
+_key_context_cache_lock = threading.Lock()
+
+def _key_context_cache_evict(budget):
+    global _key_context_cache_bytes
+    while (_key_context_cache_bytes > budget):
+        (_, ctx) = _key_context_cache.popitem(last=False)
+        _key_context_cache_bytes -= ctx.nbytes()
+
+def set_key_context_cache_budget(nbytes):
+    global key_context_cache_budget
+    with _key_context_cache_lock:
+        key_context_cache_budget = nbytes
+        _key_context_cache_evict(nbytes)
+
+def clear_key_context_cache():
+    global _key_context_cache_bytes
+    with _key_context_cache_lock:
+        _key_context_cache.clear()
+        _key_context_cache_bytes = 0
+
+def key_context_cache_info():
+    with _key_context_cache_lock:
+        return {"entries":len(_key_context_cache), "bytes":_key_context_cache_bytes,
+                "budget":key_context_cache_budget}
+
+def get_key_context(p, q, e, metrics=None):
+    global _key_context_cache_bytes
+    cache_key = (min(p,q), max(p,q), e)
+
+    with _key_context_cache_lock:
+        ctx = _key_context_cache.get(cache_key)
+        if (None != ctx):
+            _key_context_cache.move_to_end(cache_key)
+            return ctx
+
+    # A table that alone exceeds the budget is not built.  The context
+    # without table takes about no memory and is cached as 0 bytes, so the
+    # key is only precomputed once.
+    ctx = make_key_context(p, q, e, metrics, key_context_cache_budget)
+    if (None == ctx):
+        return None
+
+    with _key_context_cache_lock:
+        if (cache_key not in _key_context_cache):
+            _key_context_cache[cache_key] = ctx
+            _key_context_cache_bytes += ctx.nbytes()
+            _key_context_cache_evict(key_context_cache_budget)
+
+    return ctx
@@ -0,0 +1,77 @@
+#
+# RSAKeyContextTest.py - Tests for the key context and its cache
+#
+# Copyright (c) Microsoft Corporation. Licensed under the MIT license.
+#
+
+from RSAKeyContext import *
+
+import RSATestCases
+
+def Test_Key_Context(p, q, N, e, ntests=3):
+    key = rsa_bad_key_precompute(p, q, e)
+    ctx = get_key_context(p, q, e)
+    for _ in range(ntests):
+        pt = random.randint(1, N-1)
+        ct = pow(pt, e, N)
+        chain = [pt_hat for (_, pt_hat) in rsa_bad_key_candidates(key, ct)]
+        table = [pt_hat for (_, pt_hat) in ctx.candidates(ct)]
+        if ((chain != table) or (pt not in table)):
+            print("KEY CONTEXT CANDIDATES FAILED!")
+            return False
+        lo = random.randint(0, N-1)
+        hi = lo + N//256
+        ranged = [pt_hat for (_, pt_hat) in ctx.candidates(ct, lo=lo, hi=hi)]
+        if (ranged != [pt_hat for pt_hat in table if ((lo <= pt_hat) and (pt_hat < hi))]):
+            print("KEY CONTEXT CANDIDATE PREFILTER FAILED!")
+            return False
+        start = random.randint(0, e-1)
+        part = [pt_hat for (_, pt_hat) in ctx.candidates(ct, start, e)]
+        if (part != table[start:]):
+            print("KEY CONTEXT CANDIDATE RANGE FAILED!")
+            return False
+        chained = [pt_hat for (_, pt_hat) in KeyContext(key, table=False).candidates(ct, start, e, lo, hi)]
+        if (chained != [pt_hat for pt_hat in part if ((lo <= pt_hat) and (pt_hat < hi))]):
+            print("KEY CONTEXT CHAINED CANDIDATES FAILED!")
+            return False
+    print("PASSED.")
+    return True
+
+def Test_Key_Context_Cache(bad_keys):
+    clear_key_context_cache()
+    ctxs = [get_key_context(k["p"], k["q"], k["e"]) for k in bad_keys[:2]]
+
+    # A cached context is returned as is, with (p, q) in either order.
+    if (ctxs[0] is not get_key_context(bad_keys[0]["q"], bad_keys[0]["p"], bad_keys[0]["e"])):
+        print("KEY CONTEXT CACHE HIT FAILED!")
+        return False
+
+    # Shrinking the budget to one context evicts the least recently used one.
+    set_key_context_cache_budget(ctxs[0].nbytes())
+    info = key_context_cache_info()
+    if ((1 != info["entries"]) or (ctxs[1] is get_key_context(bad_keys[1]["p"], bad_keys[1]["q"], bad_keys[1]["e"]))):
+        print("KEY CONTEXT CACHE EVICTION FAILED!")
+        return False
+
+    # A table larger than the budget is not built, and the context without
+    # it is cached as 0 bytes.
+    clear_key_context_cache()
+    set_key_context_cache_budget(ctxs[0].nbytes() - 1)
+    ctx = get_key_context(bad_keys[0]["p"], bad_keys[0]["q"], bad_keys[0]["e"])
+    info = key_context_cache_info()
+    if ((None != ctx.roots) or (ctxs[0].root(12345) != ctx.root(12345)) or
+        (ctx is not get_key_context(bad_keys[0]["p"], bad_keys[0]["q"], bad_keys[0]["e"])) or
+        (1 != info["entries"]) or (0 != info["bytes"])):
+        print("KEY CONTEXT CACHE OVERSIZED TABLE FAILED!")
+        return False
+
+    set_key_context_cache_budget(256*1024*1024)
+    print("PASSED.")
+    return True
+
+for bad_prvk in RSATestCases.bad_priv_keys[:2]:
+    print("Key context " + str(bad_prvk["bitlength"]) + "bit test case:")
+    Test_Key_Context(bad_prvk["p"], bad_prvk["q"], bad_prvk["N"], bad_prvk["e"])
+
+print("Key context cache test case:")
+Test_Key_Context_Cache(RSATestCases.bad_priv_keys)
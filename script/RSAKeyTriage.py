@@ -0,0 +1,252 @@
+#
+# RSAKeyTriage.py - Bulk triage of private keys for the e | p-1 defect
+#
+# Copyright (c) Microsoft Corporation. Licensed under the MIT license.
+#
+# Usage:
+#   python RSAKeyTriage.py keys.jsonl [-o report.jsonl] [--all]
+#                          [--workers N] [--chunk-size 4096]
+#
+# The key file has one JSON object per line with p, q and e (integers or
+# integer strings such as "0x..."), and optionally an id:
+#
+#   {"id": "key-1", "p": "0x...", "q": "0x...", "e": 65537}
+#
+# The report has one JSON line per affected key (every key with --all):
+#
+#   {"bits": 1024, "e": 65537, "vp": 1, "vq": 0, "rp": 65537, "rq": 1,
+#    "candidates": 65537, "method": "pow", "seconds": 0.16,
+#    "oaep_seconds": 0.2, "id": "key-1"}
+#
+# vp and vq are the largest powers of e dividing p-1 and q-1, rp and rq are
+# gcd(e, p-1) and gcd(e, q-1), candidates is the number of candidate
+# plaintexts per ciphertext, and seconds and oaep_seconds the estimated
+# search times per ciphertext on one core for PKCS1 v1.5 and OAEP, see
+# estimate_seconds.  method is "pow" when the e-th roots modulo the
+# bad primes are a single exponentiation and "amm" when they need the
+# Adleman-Manders-Miller root (see EthRootContext).  A summary is written
+# to stderr.
+#
+
+from RSAOAEPPlaintextSearch import *
+from RSAPKCS1PlaintextSearch import *
+from RSARecover import parse_int
+from multiprocessing import Pool
+import argparse
+import bisect
+import functools
+import json
+import os
+import random
+import sys
+
+default_chunk_size = 4096
+calibration_steps = 20000
+
+# The largest k such that e^k divides n, for e >= 2.
+def e_valuation(n, e):
+    if (e < 2):
+        raise ValueError("Valuation base e must be at least 2.")
+    k = 0
+    while ((0 != n) and (0 == n % e)):
+        n = n // e
+        k = k + 1
+    return k
+
+# Candidates scanned per second by rsa_bad_key_scan for a bad prime of the
+# given bit length, measured once per worker on the same loop body.
+@functools.lru_cache(maxsize=None)
+def calibrate_scan_rate(bits):
+    p = random.getrandbits(bits) | (1 << (bits-1)) | 1
+    mul = ModMultiplier(p).mul
+    (u, g_step, s) = (random.randrange(p), random.randrange(p), random.randrange(p))
+    (tlo, thi) = (0, p >> 1)
+    with Timer() as timer:
+        for i in range(calibration_steps):
+            t = u - s
+            if (t < 0):
+                t = t + p
+            if ((tlo <= t) and (t < thi)):
+                pass
+            u = mul(u, g_step)
+    return calibration_steps/max(timer.interval, 1e-9)
+
+# Steps per second of the per-root loop of double_bad_key_scan_chunk (the
+# Garner range of one root modulo q and its two bisections), for primes of
+# the given bit length.
+@functools.lru_cache(maxsize=None)
+def calibrate_double_step_rate(bits):
+    p = random.getrandbits(bits) | (1 << (bits-1)) | 1
+    q = random.getrandbits(bits) | (1 << (bits-1)) | 1
+    (xq, zeta_q, qinv) = (random.randrange(q), random.randrange(q), random.randrange(p))
+    ukeys = sorted([random.randrange(p) for _ in range(4096)])
+    (lo, hi) = (p*q >> 16, p*q >> 15)
+    with Timer() as timer:
+        for i in range(calibration_steps//4):
+            s = xq*qinv % p
+            (tlo, thi) = rsa_garner_range(xq, q, p, lo, hi)
+            a = (s + tlo) % p
+            bisect.bisect_left(ukeys, a)
+            bisect.bisect_left(ukeys, a + (thi - tlo))
+            xq = xq*zeta_q % q
+    return (calibration_steps//4)/max(timer.interval, 1e-9)
+
+# Candidates per second that pass the prefix range and go through the
+# padding check of scheme ("pkcs1" or "oaep" with sha256), for a modulus of
+# the given bit length.
+@functools.lru_cache(maxsize=None)
+def calibrate_check_rate(bits, scheme):
+    N = random.getrandbits(bits) | (1 << (bits-1)) | 1
+    bytelen = (bits + 7)//8
+    if ("pkcs1" == scheme):
+        (lo, hi) = RSAES_PKCS1_v15_EM_range(bytelen)
+        check = lambda pt_hat: RSAPKCS1_check_candidate(pt_hat, bytelen)
+    else:
+        (lo, hi) = RSAES_OAEP_EM_range(bytelen)
+        codec = OAEPCodec(N, 'sha256')
+        check = lambda pt_hat: RSAOAEP_check_candidate(pt_hat, N, bytelen, 'sha256', codec=codec)
+    candidates = [random.randrange(lo, hi) for _ in range(calibration_steps//20)]
+    with Timer() as timer:
+        for pt_hat in candidates:
+            check(pt_hat)
+    return len(candidates)/max(timer.interval, 1e-9)
+
+# Estimated search seconds per ciphertext for scheme, following the search
+# that runs: rsa_bad_key_scan steps through the rp roots modulo the bad
+# prime, and RSADoubleBadKeySearch sorts the rp roots modulo p and visits
+# each of the rq roots modulo q with a bisection, instead of all rp*rq
+# candidates.  In both, only candidates inside the padding prefix range are
+# checked.
+def estimate_seconds(p, q, rp, rq, scheme):
+    N = p*q
+    bytelen = (N.bit_length() + 7)//8
+    if ("pkcs1" == scheme):
+        (lo, hi) = RSAES_PKCS1_v15_EM_range(bytelen)
+    else:
+        (lo, hi) = RSAES_OAEP_EM_range(bytelen)
+    checked = rp*rq*(hi - lo)/N
+    seconds = rp/calibrate_scan_rate(p.bit_length())
+    if (1 < rq):
+        seconds = seconds + rq/calibrate_double_step_rate(max(p.bit_length(), q.bit_length()))
+    return seconds + checked/calibrate_check_rate(N.bit_length(), scheme)
+
+# Triage of one key, returns the report dict.
+def triage_key(p, q, e):
+    if (e < 3):
+        raise ValueError("Public exponent e must be at least 3.")
+    rp = math.gcd(e, p-1)
+    rq = math.gcd(e, q-1)
+    if ((1 < rq) and (1 == rp)):
+        # Report the bad prime as p, as rsa_bad_key_precompute does.
+        (p, q) = (q, p)
+        (rp, rq) = (rq, rp)
+
+    record = {"bits":(p*q).bit_length(), "e":e, "vp":e_valuation(p-1, e), "vq":e_valuation(q-1, e),
+              "rp":rp, "rq":rq, "candidates":rp*rq}
+    if (1 == rp):
+        record["method"] = None
+        record["seconds"] = 0.0
+        record["oaep_seconds"] = 0.0
+        return record
+
+    # A single root exponent exists iff e is coprime to (p-1)/r, see
+    # rsa_prime_root_exponent.
+    if ((1 == math.gcd(e, (p-1)//rp)) and (1 == math.gcd(e, (q-1)//rq))):
+        record["method"] = "pow"
+    else:
+        record["method"] = "amm"
+    record["seconds"] = estimate_seconds(p, q, rp, rq, "pkcs1")
+    record["oaep_seconds"] = estimate_seconds(p, q, rp, rq, "oaep")
+    return record
+
+# Worker side: triages a chunk of (lineno, line) key lines and returns the
+# list of report dicts, with an "error" entry for lines that do not parse.
+def triage_chunk(lines):
+    records = []
+    for (lineno, line) in lines:
+        key_id = lineno
+        try:
+            key = json.loads(line)
+            key_id = key.get("id", lineno)
+            record = triage_key(parse_int(key["p"]), parse_int(key["q"]), parse_int(key["e"]))
+        except (ValueError, TypeError, KeyError, AttributeError) as err:
+            record = {"error":str(err)}
+        record["id"] = key_id
+        records.append(record)
+    return records
+
+# Yields lists of up to chunk_size (lineno, line) pairs of non-empty lines.
+def read_key_chunks(f, chunk_size):
+    chunk = []
+    for (lineno, line) in enumerate(f, 1):
+        if (0 == len(line.strip())):
+            continue
+        chunk.append((lineno, line))
+        if (len(chunk) >= chunk_size):
+            yield chunk
+            chunk = []
+    if (0 != len(chunk)):
+        yield chunk
+
+# Triages every key in the open file f on a pool of workers and writes the
+# report to out.  Returns the summary dict.
+def triage_keys(f, out, workers=None, chunk_size=default_chunk_size, report_all=False):
+    summary = {"keys":0, "affected":0, "double":0, "amm":0, "errors":0,
+               "max_candidates":0, "total_seconds":0.0, "candidates":{}}
+    with Timer() as t:
+        with Pool(processes=workers) as pool:
+            for records in pool.imap(triage_chunk, read_key_chunks(f, chunk_size)):
+                lines = []
+                for record in records:
+                    summary["keys"] = summary["keys"] + 1
+                    if ("error" in record):
+                        summary["errors"] = summary["errors"] + 1
+                        sys.stderr.write(json.dumps(record) + "\n")
+                        continue
+                    if (1 < record["rp"]):
+                        summary["affected"] = summary["affected"] + 1
+                        if (1 < record["rq"]):
+                            summary["double"] = summary["double"] + 1
+                        if ("amm" == record["method"]):
+                            summary["amm"] = summary["amm"] + 1
+                        summary["max_candidates"] = max(summary["max_candidates"], record["candidates"])
+                        summary["total_seconds"] = summary["total_seconds"] + record["seconds"]
+                        n = str(record["candidates"])
+                        summary["candidates"][n] = summary["candidates"].get(n, 0) + 1
+                    elif (not report_all):
+                        continue
+                    lines.append(json.dumps(record) + "\n")
+                out.write("".join(lines))
+    summary["seconds"] = t.interval
+    summary["keys_per_second"] = summary["keys"]/max(t.interval, 1e-9)
+    return summary
+
+def main(argv):
+    parser = argparse.ArgumentParser(description="Find private keys affected by the e | p-1 defect.")
+    parser.add_argument("keys", help="JSON lines key file, - for stdin")
+    parser.add_argument("-o", "--output", help="JSON lines report file (default: stdout)")
+    parser.add_argument("--all", action="store_true", help="report unaffected keys too")
+    parser.add_argument("--workers", type=int, default=os.cpu_count(), help="worker processes")
+    parser.add_argument("--chunk-size", type=int, default=default_chunk_size, help="keys per work item")
+    args = parser.parse_args(argv)
+
+    out = sys.stdout
+    if (None != args.output):
+        out = open(args.output, "w")
+    try:
+        if ("-" == args.keys):
+            summary = triage_keys(sys.stdin, out, args.workers, args.chunk_size, args.all)
+        else:
+            with open(args.keys, "r") as f:
+                summary = triage_keys(f, out, args.workers, args.chunk_size, args.all)
+    finally:
+        if (None != args.output):
+            out.close()
+
+    sys.stderr.write(json.dumps(summary) + "\n")
+    if (0 != summary["errors"]):
+        return 1
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,70 @@
+#
+# RSAKeyTriageTest.py - Test for the bulk key triage
+#
+# Copyright (c) Microsoft Corporation. Licensed under the MIT license.
+#
+
+from RSAKeyTriage import *
+
+import RSATestCases
+import tempfile
+
+def test_triage():
+    valid = RSATestCases.valid_priv_keys[0]
+    bad = RSATestCases.bad_priv_keys[0]
+    double = RSATestCases.double_bad_priv_keys[0]
+    gen = RSATestCases.gen_bad_priv_keys[0]
+    sq = RSATestCases.sq_bad_priv_keys[0]
+
+    keys = [{"id":"valid", "p":valid["p"], "q":valid["q"], "e":valid["e"]},
+            {"id":"bad", "p":hex(bad["q"]), "q":hex(bad["p"]), "e":bad["e"]},
+            {"id":"double", "p":double["p"], "q":double["q"], "e":double["e"]},
+            {"id":"gen", "p":gen["p"], "q":gen["q"], "e":gen["e"]},
+            {"id":"sq", "p":sq["p"], "q":sq["q"], "e":sq["e"]},
+            {"id":"broken", "p":"zz", "q":1, "e":3},
+            {"id":"e=0", "p":bad["p"], "q":bad["q"], "e":0},
+            {"id":"e=1", "p":bad["p"], "q":bad["q"], "e":1}]
+
+    with tempfile.TemporaryDirectory() as tmpdir:
+        keyfile = os.path.join(tmpdir, "keys.jsonl")
+        with open(keyfile, "w") as f:
+            for key in keys:
+                f.write(json.dumps(key) + "\n")
+        with open(keyfile, "r") as f, open(os.path.join(tmpdir, "report.jsonl"), "w") as out:
+            summary = triage_keys(f, out, workers=2, chunk_size=2)
+        with open(os.path.join(tmpdir, "report.jsonl"), "r") as f:
+            report = dict([(record["id"], record) for record in map(json.loads, f)])
+
+    if ((8 != summary["keys"]) or (4 != summary["affected"]) or (1 != summary["double"]) or
+        (3 != summary["errors"]) or (sorted(report.keys()) != ["bad", "double", "gen", "sq"])):
+        print("Triage summary FAILED.")
+        return False
+
+    if ((65537 != report["bad"]["candidates"]) or (1 != report["bad"]["vp"]) or
+        (0 != report["bad"]["vq"]) or ("pow" != report["bad"]["method"])):
+        print("Triage bad key FAILED.")
+        return False
+
+    if ((65537*65537 != report["double"]["candidates"]) or (15 != report["gen"]["candidates"]) or
+        (2 > report["sq"]["vp"]) or ("amm" != report["sq"]["method"])):
+        print("Triage key classes FAILED.")
+        return False
+
+    # The double-bad search visits each root modulo q once, not every
+    # candidate: seconds, not the rp*rq scan steps of hours.
+    double_scan = 65537*65537/calibrate_scan_rate(double["p"].bit_length())
+    if ((100*report["double"]["seconds"] > double_scan) or
+        (report["double"]["seconds"] > report["double"]["oaep_seconds"])):
+        print("Triage double-bad estimate FAILED.")
+        return False
+
+    if ((2 != e_valuation(2*65537**2, 65537)) or (0 != e_valuation(7, 3))):
+        print("Triage valuation FAILED.")
+        return False
+
+    print("PASSED.")
+    return True
+
+if __name__ == "__main__":
+    print("RSA key triage test case:\n")
+    test_triage()
@@ -6,34 +6,177 @@
 
 import time
 import random
+import json
+import math
 
 class Timer:
     def __enter__(self):
-        self.start = time.clock()
+        self.start = time.perf_counter()
         return self
 
     def __exit__(self, *args):
-        self.end = time.clock()  #TODO: remove deprecated function
+        self.end = time.perf_counter()
         self.interval = self.end - self.start
 
+# Per-phase timings (seconds) and event counts for a search.  Phases used by
+# the searches are "generator search", "key precompute", "roots table",
+# "private key ops", "candidate scan" and "decode" (decode time is also part
+# of the scan).
+# Counts are "candidates", "survivors", "plaintexts" and one "rejected: ..."
+# entry per padding rejection reason.  Nothing is printed; use to_dict or
+# to_json_line to get the numbers.
+class SearchMetrics:
+    def __init__(self):
+        self.phases = {}
+        self.counts = {}
+
+    def phase(self, name):
+        return MetricsPhase(self, name)
+
+    def add_time(self, name, seconds):
+        self.phases[name] = self.phases.get(name, 0.0) + seconds
+
+    def count(self, name, n=1):
+        self.counts[name] = self.counts.get(name, 0) + n
+
+    def candidates_per_second(self):
+        scan = self.phases.get("candidate scan", 0.0)
+        if (0.0 == scan):
+            return 0.0
+        return self.counts.get("candidates", 0)/scan
+
+    # Adds in the numbers of another SearchMetrics or of its to_dict output,
+    # e.g. from a worker process.
+    def merge(self, other):
+        if (isinstance(other, SearchMetrics)):
+            other = other.to_dict()
+        for (name, seconds) in other["phases"].items():
+            self.add_time(name, seconds)
+        for (name, n) in other["counts"].items():
+            self.count(name, n)
+
+    def to_dict(self):
+        return {"phases":dict(self.phases), "counts":dict(self.counts),
+                "candidates_per_second":self.candidates_per_second()}
+
+    def to_json_line(self, **extra):
+        record = self.to_dict()
+        record.update(extra)
+        return json.dumps(record)
+
+# Compact record of one recovered plaintext: the message bytes, the index of
+# the candidate root it came from and, for PKCS1 v1.5, the padding length.
+class PlaintextResult:
+    __slots__ = ("plaintext", "index", "paddinglength")
+
+    def __init__(self, plaintext, index, paddinglength=None):
+        self.plaintext = plaintext
+        self.index = index
+        self.paddinglength = paddinglength
+
+    def __repr__(self):
+        return ("PlaintextResult(plaintext=" + repr(self.plaintext) + ", index=" + str(self.index) +
+                ", paddinglength=" + str(self.paddinglength) + ")")
+
+    # The plaintext dict format of the list returning search functions.
+    def to_dict(self):
+        pt_dict = {"plaintext":int.from_bytes(self.plaintext, 'big')}
+        if (None != self.paddinglength):
+            pt_dict["paddinglength"] = self.paddinglength
+        pt_dict["plaintextlength"] = len(self.plaintext)
+        return pt_dict
+
+# Adapts decode, which returns (M, paddinglength) or None for a candidate,
+# to the classify callback of plaintext_search_iter.
+def decode_classifier(decode):
+    def classify(i, pt_hat):
+        decoded = decode(pt_hat)
+        if (None == decoded):
+            return ()
+        return (PlaintextResult(decoded[0], i, decoded[1]),)
+    return classify
+
+# Drives a candidate scan (a generator of (index, candidate) pairs) and
+# yields the results that classify(index, candidate) returns, a possibly
+# empty sequence of PlaintextResult objects per candidate.  Stops after
+# max_results results.  Only the time spent inside the generator counts as
+# "candidate scan", and the candidate counts in metrics cover the indices
+# actually scanned, also when the caller stops early.  Candidates outside
+# the scan's prefix range are counted as prefix_reason.
+def plaintext_search_iter(scan, classify, ncandidates, prefix_reason, max_results, metrics):
+    (scanned, survivors, nfound) = (0, 0, 0)
+    t = time.perf_counter()
+    try:
+        for (i, pt_hat) in scan:
+            survivors = survivors + 1
+            for result in classify(i, pt_hat):
+                nfound = nfound + 1
+                scanned = i + 1
+                metrics.add_time("candidate scan", time.perf_counter() - t)
+                t = None
+                yield result
+                t = time.perf_counter()
+                if ((None != max_results) and (nfound >= max_results)):
+                    return
+        scanned = ncandidates
+    finally:
+        if (None != t):
+            metrics.add_time("candidate scan", time.perf_counter() - t)
+        metrics.count("candidates", scanned)
+        metrics.count("survivors", survivors)
+        metrics.count(prefix_reason, scanned - survivors)
+        metrics.count("plaintexts", nfound)
+
+class MetricsPhase(Timer):
+    def __init__(self, metrics, name):
+        self.metrics = metrics
+        self.name = name
+
+    def __exit__(self, *args):
+        Timer.__exit__(self, *args)
+        self.metrics.add_time(self.name, self.interval)
+
+# Returns (a,b,g) with a*x + b*y = g = gcd(x,y), where x is the larger of
+# the two arguments.  Only the coefficient of x is carried through the loop,
+# the other one follows from g at the end.
 def xgcd(x,y):
     if (x < y):
         (x,y) = (y,x)
-    (a,b,g,u,v,w) = (1,0,x,0,1,y)
+    (a,u,g,w) = (1,0,x,y)
     while (w > 0):
-        q = g//w
-        (a,b,g,u,v,w) = (u,v,w,a-q*u,b-q*v,g-q*w)
-    return (a,b,g)
+        (q,r) = divmod(g,w)
+        (a,u) = (u,a-q*u)
+        (g,w) = (w,r)
+    if (0 == y):
+        return (a,0,g)
+    return (a,(g-a*x)//y,g)
 
+# The inverse of x modulo N, or None if there is none.
 def modinv(x,N):
-    if (x >= N):
-        x = x%N
-    (a,b,g) = xgcd(N,x)
-    if (1 != g):
+    try:
+        return pow(x, -1, N)
+    except ValueError:
         return None
-    if (b < 0):
-        b = (b + N) % N
-    return b
+
+# Inverses of all of xs modulo N with Montgomery's simultaneous inversion:
+# one modinv and about 3*len(xs) multiplications.  Entries that are not
+# invertible are None.
+def modinv_batch(xs, N):
+    xs = [x % N for x in xs]
+    prefix = []
+    acc = 1
+    for x in xs:
+        prefix.append(acc)
+        acc = acc*x % N
+    inv = modinv(acc, N)
+    if (None == inv):
+        # Some entry shares a factor with N, invert one at a time.
+        return [modinv(x, N) for x in xs]
+    invs = [None]*len(xs)
+    for i in range(len(xs)-1, -1, -1):
+        invs[i] = inv*prefix[i] % N
+        inv = inv*xs[i] % N
+    return invs
 
 def find_generator(a,b,N):
     g = 2
@@ -50,6 +193,257 @@ def find_generator(a,b,N):
     return g
 
 
+# Distinct prime factors of n by trial division.  Used for the number of
+# roots r = gcd(e, p-1), which is small enough to enumerate.
+def small_prime_factors(n):
+    factors = []
+    f = 2
+    while (f*f <= n):
+        if (0 == n % f):
+            factors.append(f)
+            while (0 == n % f):
+                n = n//f
+        f = f + 1 + (f & 1)
+    if (1 < n):
+        factors.append(n)
+    return factors
+
+# Returns a generator of the group of r-th roots of unity modulo the prime
+# p, where r divides p-1: g^((p-1)/r) for the first g for which it has order
+# exactly r.
+def find_root_of_unity(r, p):
+    if (1 == r):
+        return 1
+    if (0 != (p-1) % r):
+        print("ERROR: r does not divide p-1.")
+        return None
+    m = (p-1)//r
+    ells = small_prime_factors(r)
+    for g in range(2, p):
+        zeta = pow(g, m, p)
+        if (all([1 != pow(zeta, r//ell, p) for ell in ells])):
+            return zeta
+    print("ERROR: Unable to find a root of unity.")
+    return None
+
+# Roots of x -> x^e modulo the prime p.  An e-th power residue c has
+# r = gcd(e, p-1) e-th roots modulo p, one root times the r-th roots of
+# unity.  Returns (r, d) where pow(c, d, p) is one of the roots, or None if
+# e is not coprime to (p-1)/r (then no such single exponent exists).
+def rsa_prime_root_exponent(p, e):
+    r = math.gcd(e, p-1)
+    d = modinv(e, (p-1)//r)
+    if (None == d):
+        return None
+    return (r, d)
+
+# Discrete logarithm of h to the base gamma of order ell modulo p, by baby
+# step giant step.  baby is the table {gamma^j: j} for j < m and giant is
+# gamma^-m.  Returns None if h is not a power of gamma.
+def bsgs_dlog(h, baby, giant, m, ell, p):
+    for i in range(0, ell//m + 1):
+        j = baby.get(h)
+        if (None != j):
+            return i*m + j
+        h = h*giant % p
+    return None
+
+# e-th roots modulo the prime p for any e, in the style of
+# Adleman-Manders-Miller.
+#
+# With r = gcd(e, p-1) and a = (e/r)^-1 mod (p-1)/r, a*e = r mod p-1, so if
+# y is an r-th root of c then y^a is an e-th root.  The r-th root is put
+# together from ell^k-th roots for the prime powers ell^k of r: with
+# p-1 = ell^s*t, t coprime to ell, x = c^(ell^-k mod t) is a root up to an
+# error in the Sylow ell-subgroup, and the error is removed with its
+# discrete logarithm to a generator gamma of that subgroup (Pohlig-Hellman,
+# with baby step giant step for each base ell digit).  The cost is O(s)
+# exponentiations and O(s*sqrt(ell)) multiplications per prime.
+#
+# If gcd(e, (p-1)/r) = 1 this reduces to the single exponentiation of
+# rsa_prime_root_exponent, which is used directly.
+class EthRootContext:
+    def __init__(self, p, e):
+        self.p = p
+        self.e = e
+        self.r = math.gcd(e, p-1)
+
+        roots = rsa_prime_root_exponent(p, e)
+        if (None != roots):
+            self.d = roots[1]
+            return
+        self.d = None
+
+        self.a = modinv(e//self.r, (p-1)//self.r)
+
+        # one entry per prime power ell^k of r
+        self.primes = []
+        rhat = self.r
+        for ell in small_prime_factors(self.r):
+            k = 0
+            while (0 == rhat % ell):
+                rhat = rhat//ell
+                k = k + 1
+            n = ell**k
+
+            s = 0
+            t = p-1
+            while (0 == t % ell):
+                t = t//ell
+                s = s + 1
+
+            # gamma generates the Sylow ell-subgroup, of order ell^s
+            h = 2
+            while (1 == pow(h, (p-1)//ell, p)):
+                h = h + 1
+            gamma = pow(h, t, p)
+
+            # baby step giant step tables for the subgroup of order ell
+            gamma_ell = pow(gamma, ell**(s-1), p)
+            m = math.isqrt(ell) + 1
+            baby = {}
+            x = 1
+            for j in range(m):
+                baby.setdefault(x, j)
+                x = x*gamma_ell % p
+            giant = pow(x, -1, p)
+
+            # weight of this root in the r-th root, see root_r
+            alpha = modinv((self.r//n) % n, n) if (1 < n) else 0
+
+            self.primes.append({"ell":ell, "k":k, "n":n, "s":s, "u":modinv(n % t, t) if (1 < t) else 0,
+                                "gamma":gamma, "gamma_inv":pow(gamma, -1, p), "baby":baby,
+                                "giant":giant, "m":m, "alpha":alpha})
+
+        # sum(alpha*r/n) = 1 + r*j over the prime powers, j is corrected in
+        # root_r
+        total = sum([f["alpha"]*(self.r//f["n"]) for f in self.primes])
+        self.j = (total - 1)//self.r
+
+    # An ell^k-th root of c, for the prime power entry f, or None if c is not
+    # an ell^k-th power.
+    def _prime_power_root(self, c, f):
+        p = self.p
+        (ell, n, s) = (f["ell"], f["n"], f["s"])
+        x = pow(c, f["u"], p)
+        # x^n = c*eps with eps in the Sylow ell-subgroup, find w with
+        # w^n = eps^-1 from the discrete logarithm of eps^-1 to gamma
+        h = pow(x, -n, p)*c % p
+        L = 0
+        gamma_inv_L = 1
+        ellpow = 1
+        for i in range(s):
+            hi = pow(h*gamma_inv_L % p, ell**(s-1-i), p)
+            digit = bsgs_dlog(hi, f["baby"], f["giant"], f["m"], ell, p)
+            if (None == digit):
+                return None
+            L = L + digit*ellpow
+            gamma_inv_L = gamma_inv_L*pow(f["gamma_inv"], digit*ellpow, p) % p
+            ellpow = ellpow*ell
+        if (0 != L % n):
+            return None
+        return x*pow(f["gamma"], L//n, p) % p
+
+    # An r-th root of c: the product of the ell^k-th roots raised to alpha,
+    # whose r-th power is c^(1 + r*j), divided by c^j.
+    def root_r(self, c):
+        p = self.p
+        y = pow(c, -self.j, p)
+        for f in self.primes:
+            x = self._prime_power_root(c, f)
+            if (None == x):
+                return None
+            y = y*pow(x, f["alpha"], p) % p
+        return y
+
+    # One e-th root of c modulo p, if c is an e-th power.  When the
+    # discrete logarithm path is used, None is returned for a c that is not
+    # an e-th power.
+    def root(self, c):
+        c = c % self.p
+        if (None != self.d):
+            return pow(c, self.d, self.p)
+        if (0 == c):
+            return 0
+        y = self.root_r(c)
+        if (None == y):
+            return None
+        return pow(y, self.a, self.p)
+
+# Modular multiplication context for a fixed modulus N.
+#
+# method is one of:
+#   "native"     - a*b % N
+#   "montgomery" - Montgomery reduction with R = 2^k, N must be odd
+#   "barrett"    - Barrett reduction with a precomputed reciprocal of N
+#
+# mul(a, b) returns the product in the same domain as its arguments.  For
+# repeated multiplication by a constant c, mul(a, prepare(c)) returns a*c % N
+# for an ordinary residue a, so no conversion of a is needed.
+# On CPython the native % is the fastest (see RSAMathBenchmark.py), the
+# others are kept for interpreters and integer backends where it is not.
+class ModMultiplier:
+    def __init__(self, N, method="native"):
+        if (method not in ("native", "montgomery", "barrett")):
+            raise ValueError("Unknown modular multiplication method " + str(method) + ".")
+        if (("montgomery" == method) and (0 == N % 2)):
+            raise ValueError("Montgomery multiplication needs an odd modulus.")
+
+        self.N = N
+        self.method = method
+        self.k = N.bit_length()
+        self.mask = (1 << self.k) - 1
+
+        if ("montgomery" == method):
+            R = 1 << self.k
+            self.R2 = R*R % N
+            self.Nprime = (-modinv(N, R)) % R
+            self.mul = self.mul_montgomery
+        elif ("barrett" == method):
+            self.m = (1 << (2*self.k)) // N
+            self.mul = self.mul_barrett
+        else:
+            self.mul = self.mul_native
+
+    def mul_native(self, a, b):
+        return a*b % self.N
+
+    def reduce_montgomery(self, T):
+        u = ((T & self.mask)*self.Nprime) & self.mask
+        t = (T + u*self.N) >> self.k
+        if (t >= self.N):
+            t = t - self.N
+        return t
+
+    def mul_montgomery(self, a, b):
+        return self.reduce_montgomery(a*b)
+
+    def mul_barrett(self, a, b):
+        x = a*b
+        r = x - (((x >> (self.k-1))*self.m) >> (self.k+1))*self.N
+        while (r >= self.N):
+            r = r - self.N
+        return r
+
+    def to_domain(self, x):
+        if ("montgomery" == self.method):
+            return self.reduce_montgomery((x % self.N)*self.R2)
+        return x % self.N
+
+    def from_domain(self, x):
+        if ("montgomery" == self.method):
+            return self.reduce_montgomery(x)
+        return x
+
+    def to_domain_many(self, xs):
+        return [self.to_domain(x) for x in xs]
+
+    def from_domain_many(self, xs):
+        return [self.from_domain(x) for x in xs]
+
+    def prepare(self, c):
+        return self.to_domain(c)
+
 def calculate_decrypt_exponent(p, q, e):
     phiN = (p-1)*(q-1)
     d = modinv(e, phiN)
@@ -75,30 +469,196 @@ def rsa_crt_mod_exp(x, a, p, q, Mp, Mq):
     yq = pow(xq, aq, q)
     y = (yp*Mp + yq*Mq) % N
     return y
-    
 
-def fix_bad_rsa_encryption(p,q,e,ct,pt):
-    if (((2**16)+1) < e):
-        print("ERROR: Supplied public exponent is larger than Fermat-4.")
+# RSA private key with the CRT exponents dp, dq and qinv = q^-1 mod p
+# precomputed.  Decryption is two half width exponentiations and Garner's
+# recombination x = xq + q*((xp - xq)*qinv mod p), which only needs half
+# width products.
+class RSAPrivateKeyCRT:
+    __slots__ = ("p", "q", "N", "e", "d", "dp", "dq", "qinv", "bytelen")
+
+    def __init__(self, p, q, d, e=None):
+        if ((int != type(p)) or (int != type(q)) or (int != type(d))):
+            raise TypeError("Private key arguments p, q and d must be type int.")
+        self.p = p
+        self.q = q
+        self.N = p*q
+        self.e = e
+        self.d = d
+        self.dp = d % (p-1)
+        self.dq = d % (q-1)
+        self.qinv = modinv(q, p)
+        if (None == self.qinv):
+            raise ValueError("Private key primes p and q must be coprime.")
+        self.bytelen = (self.N.bit_length() + 7)//8
+
+    def decrypt(self, c):
+        (p, q) = (self.p, self.q)
+        xp = pow(c % p, self.dp, p)
+        xq = pow(c % q, self.dq, q)
+        return xq + q*((xp - xq)*self.qinv % p)
+
+    def decrypt_many(self, cts):
+        (p, q, dp, dq, qinv) = (self.p, self.q, self.dp, self.dq, self.qinv)
+        pts = []
+        for c in cts:
+            xq = pow(c % q, dq, q)
+            pts.append(xq + q*((pow(c % p, dp, p) - xq)*qinv % p))
+        return pts
+
+# Builds an RSAPrivateKeyCRT from a make_private_key dict.
+def make_private_key_crt(prvk):
+    return RSAPrivateKeyCRT(prvk["p"], prvk["q"], prvk["d"], prvk["e"])
+
+
+# Precomputation for a key where e shares a factor with exactly one of p-1
+# and q-1.  The ciphertexts then have r = gcd(e, p-1) (for the bad prime p)
+# e-th roots modulo N, which is the number of candidates to search.  r can be
+# much smaller than e, and e itself is not limited.  If e is not coprime to
+# (p-1)/r (e.g. e^2 divides p-1), there is no exponent dp and the root
+# modulo p is found with EthRootContext.
+def rsa_bad_key_precompute(p, q, e, metrics=None):
+    N = p*q
+    (rp, rq) = (math.gcd(e, p-1), math.gcd(e, q-1))
+
+    if ((1 == rp) and (1 == rq)):
+        print("ERROR: the exponent is coprime to (p-1)(q-1).")
+        return None
+
+    if ((1 != rp) and (1 != rq)):
+        print("ERROR: the exponent shares a factor with both p-1 and q-1, see RSADoubleBadKeySearch.")
+        return None
+
+    # Make p the bad prime.  The non-trivial r-th roots of unity only exist
+    # modulo p, modulo q the e-th root of a ciphertext is unique.
+    if (1 != rq):
+        (p,q) = (q,p)
+
+    if (None == metrics):
+        metrics = SearchMetrics()
+
+    with metrics.phase("key precompute"):
+        root_p = EthRootContext(p, e)
+    (r, dp) = (root_p.r, root_p.d)
+
+    dq = modinv(e,q-1)
+
+    # g_e_torsion generates the r-th roots of unity modulo p
+    with metrics.phase("generator search"):
+        g_e_torsion = find_root_of_unity(r, p)
+
+    if (None == g_e_torsion):
         return None
 
-    (bad_p,bad_q) = (0 == ((p-1)%e),0 == ((q-1)%e))
+    with metrics.phase("key precompute"):
+        (Mp,Mq) = rsa_crt_precompute(p,q)
+        qinv = modinv(q,p)
+
+    bytelen = (N.bit_length() + 7)//8
+
+    return {"p":p, "q":q, "N":N, "e":e, "r":r, "dp":dp, "dq":dq, "root_p":root_p,
+            "g_e_torsion":g_e_torsion, "Mp":Mp, "Mq":Mq, "qinv":qinv,
+            "bytelen":bytelen}
+
+# For x = xq + q*t with 0 <= xq < q and 0 <= t < p, returns the range
+# [tlo, thi) of t for which lo <= x < hi.  hi = None means no upper bound.
+def rsa_garner_range(xq, q, p, lo, hi):
+    tlo = max(0, -((xq - lo)//q))
+    if (None == hi):
+        return (tlo, p)
+    thi = min(p, -((xq - hi)//q))
+    return (tlo, thi)
+
+# Generates the r candidate plaintexts (e-th roots of ct modulo N) for a key
+# from rsa_bad_key_precompute, as (index, candidate) pairs.
+#
+# The root modulo the good prime q is fixed, so only the residue modulo the
+# bad prime p is stepped through the r-th roots of unity, using half-width
+# arithmetic.  Each candidate is rebuilt with Garner's recombination
+#   x = xq + q*((xp - xq)*qinv mod p)
+# where the factor qinv is folded into the stepped residue.
+#
+# Only candidates with lo <= x < hi are generated.  The bound is checked on
+# the half-width Garner coefficient, so rejected candidates are never
+# rebuilt to full width.
+def rsa_bad_key_candidates(key, ct, lo=0, hi=None):
+    (zp, xq) = rsa_bad_key_residues(key, ct)
+    return rsa_bad_key_scan(key, zp, xq, lo, hi)
+
+# The e-th root of ct modulo the good prime q, and one e-th root modulo the
+# bad prime p.  These are the only per-ciphertext private key operations.
+# zp is None if ct is found not to be an e-th power modulo p, the scans then
+# generate no candidates.
+def rsa_bad_key_residues(key, ct):
+    q = key["q"]
+    if (None != key["dp"]):
+        p = key["p"]
+        zp = pow(ct % p, key["dp"], p)
+    else:
+        zp = key["root_p"].root(ct)
+    xq = pow(ct % q, key["dq"], q)
+    return (zp, xq)
+
+# Scans the candidate indices [start, stop) from the residues returned by
+# rsa_bad_key_residues.  The first root of unity g_e_torsion^start is reached
+# with one modular exponentiation, so disjoint index ranges can be scanned
+# independently.  mulp is an optional ModMultiplier modulo p for the step.
+def rsa_bad_key_scan(key, zp, xq, lo=0, hi=None, start=0, stop=None, mulp=None):
+    p = key["p"]
+    q = key["q"]
+    g_e_torsion = key["g_e_torsion"]
+
+    if (None == mulp):
+        mulp = ModMultiplier(p)
+    mul = mulp.mul
+    g_step = mulp.prepare(g_e_torsion)
 
-    if (bad_p and bad_q):
-        print("ERROR: both p and q are divisible by the public exponent.")
+    if (None == stop):
+        stop = key["r"]
+
+    if (None == zp):
+        return
+
+    u = zp*key["qinv"]*pow(g_e_torsion, start, p) % p
+    s = xq*key["qinv"] % p
+    (tlo, thi) = rsa_garner_range(xq, q, p, lo, hi)
+
+    for i in range(start, stop):
+        t = u - s
+        if (t < 0):
+            t = t + p
+        if ((tlo <= t) and (t < thi)):
+            yield (i, xq + q*t)
+        u = mul(u, g_step)
+
+def fix_bad_rsa_encryption(p,q,e,ct,pt):
+    (rp,rq) = (math.gcd(e,p-1),math.gcd(e,q-1))
+
+    if ((1 == rp) and (1 == rq)):
+        print("ERROR: the public exponent is coprime to (p-1)(q-1).")
+        return None
+
+    if ((1 != rp) and (1 != rq)):
+        print("ERROR: both p-1 and q-1 share a factor with the public exponent.")
         return None
 
     # Make p the bad prime
-    if (bad_q):
+    if (1 != rq):
         (p,q) = (q,p)
+        (rp,rq) = (rq,rp)
+
+    # number of e-th roots
+    r = rp
 
-    if (0 == (p-1)%(e*e)):
-        print("ERROR: bad prime is divisible by square of public exponent.")
+    # no decrypt exponent below, the root modulo p is found by
+    # EthRootContext in rsa_bad_key_precompute
+    if (1 != math.gcd(e,(p-1)//r)):
+        print("Bad prime is divisible by square of public exponent, using discrete logarithm e-th root.")
 
     N = p*q
     phi_N = (p-1)*(q-1)
 
-    phihat_N = phi_N//e
+    phihat_N = phi_N//r
 
     print(phihat_N)
 
@@ -112,36 +672,37 @@ def fix_bad_rsa_encryption(p,q,e,ct,pt):
 
     print("Searching for good generator...");
     with Timer() as t:
-        g = find_generator(e,phihat_N,N)
+        g = find_generator(r,phihat_N,N)
     print("Good generator found in " + str(t.interval) + " seconds.");
 
     print(g)
 
     with Timer() as t:
         g_e_torsion = pow(g, phihat_N, N)
-        z = pow(ct,d,N)
+        if (None != d):
+            z = pow(ct,d,N)
     print("non crt private key operations done in " + str(t.interval) + " seconds.");
     
     with Timer() as t:
         (Mp,Mq) = rsa_crt_precompute(p,q)
         g_e_torsion = rsa_crt_mod_exp(g, phihat_N, p, q, Mp, Mq)
-        z = rsa_crt_mod_exp(ct, d, p, q, Mp, Mq)
+        if (None != d):
+            z = rsa_crt_mod_exp(ct, d, p, q, Mp, Mq)
     print("crt private key operations done in " + str(t.interval) + " seconds.");
 
     print("g of e torsion group = " + str(g_e_torsion))
 
+    key = rsa_bad_key_precompute(p, q, e)
+    if (None == key):
+        return None
+
     print("Searching for plaintext...")
     with Timer() as t:
-        i = 1
-        ell = g_e_torsion
-        while (i < e):
-            pt_hat = ell*z % N
+        pt_hat = None
+        for (i, pt_hat) in rsa_bad_key_candidates(key, ct, pt, pt+1):
             if (pt_hat == pt):
                 print("plaintext found.")
                 break
-            i = i + 1
-            ell = ell*g_e_torsion % N
     print("Plaintext search finished in " + str(t.interval) + " seconds.");
 
     return pt_hat
-
@@ -0,0 +1,25 @@
+#
+# RSAMathBenchmark.py - Benchmark of the modular multiplication methods
+#
+# Copyright (c) Microsoft Corporation. Licensed under the MIT license.
+#
+
+from RSAMath import *
+import timeit
+
+def Benchmark_Mod_Multiplier(bits, ntests=20000):
+    N = random.getrandbits(bits) | (1 << (bits-1)) | 1
+    a = random.randint(1, N-1)
+    c = random.randint(1, N-1)
+
+    t = timeit.timeit(lambda: a*c % N, number=ntests)
+    print(str(bits) + " bit a*c % N:          " + str(t/ntests*1e6) + " us")
+
+    for method in ("native", "montgomery", "barrett"):
+        mulctx = ModMultiplier(N, method)
+        cm = mulctx.prepare(c)
+        t = timeit.timeit(lambda: mulctx.mul(a, cm), number=ntests)
+        print(str(bits) + " bit " + method + " multiplier: " + str(t/ntests*1e6) + " us")
+
+for bits in (1024, 2048, 3072, 4096):
+    Benchmark_Mod_Multiplier(bits)
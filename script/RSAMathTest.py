@@ -19,6 +19,81 @@ def Test_Mod_CRT(N, p, q,ntests=10):
             return False
     return True
 
+def Test_Private_Key_CRT(N, p, q, ntests=10):
+    phiN = (p-1)*(q-1)
+    d = random.randint(1, phiN)
+    key = RSAPrivateKeyCRT(p, q, d)
+    xs = [random.randint(0, N-1) for _ in range(ntests)]
+    ys = [pow(x, d, N) for x in xs]
+    if ((ys != [key.decrypt(x) for x in xs]) or (ys != key.decrypt_many(xs))):
+        print("PRIVATE KEY CRT FAILED!")
+        return False
+    return True
+
+def Test_Modinv_Batch(N, p, q, ntests=10):
+    xs = [random.randint(1, N-1) for _ in range(ntests)]
+    for x in xs:
+        (a, b, g) = xgcd(N, x)
+        if ((1 != g) or (1 != (a*N + b*x) % N) or (1 != x*modinv(x, N) % N)):
+            print("MODINV FAILED!")
+            return False
+    if ((modinv_batch(xs, N) != [modinv(x, N) for x in xs]) or ([] != modinv_batch([], N))):
+        print("MODINV BATCH FAILED!")
+        return False
+    invs = modinv_batch(xs + [p*3, 0], N)
+    if ((None != invs[-1]) or (None != invs[-2]) or (invs[:-2] != [modinv(x, N) for x in xs])):
+        print("MODINV BATCH NON-INVERTIBLE FAILED!")
+        return False
+    return True
+
+def Test_Eth_Root(p, exponents, ntests=5):
+    for e in exponents:
+        rootctx = EthRootContext(p, e)
+        for _ in range(ntests):
+            c = pow(random.randint(1, p-1), e, p)
+            x = rootctx.root(c)
+            if ((None == x) or (c != pow(x, e, p))):
+                print("ETH ROOT FAILED for e = " + str(e))
+                return False
+    return True
+
+def Test_Mod_Multiplier(N, ntests=10):
+    for method in ("native", "montgomery", "barrett"):
+        mulctx = ModMultiplier(N, method)
+        xs = [random.randint(0, N-1) for _ in range(ntests)]
+        c = random.randint(0, N-1)
+        cm = mulctx.prepare(c)
+        xd = mulctx.to_domain_many(xs)
+        for (x, y) in zip(xs, xd):
+            if ((x*c % N) != mulctx.mul(x, cm)):
+                print("MOD MULTIPLIER " + method + " FAILED!")
+                return False
+            if ((x*x % N) != mulctx.from_domain(mulctx.mul(y, y))):
+                print("MOD MULTIPLIER " + method + " FAILED!")
+                return False
+        if (xs != mulctx.from_domain_many(xd)):
+            print("MOD MULTIPLIER " + method + " FAILED!")
+            return False
+    return True
+
+def Test_Search_Metrics():
+    metrics = SearchMetrics()
+    with metrics.phase("candidate scan"):
+        time.sleep(0.01)
+    metrics.count("candidates", 100)
+    other = SearchMetrics()
+    other.count("candidates", 50)
+    other.add_time("candidate scan", 0.5)
+    metrics.merge(other.to_dict())
+    record = json.loads(metrics.to_json_line(keybits=256))
+    if ((150 != record["counts"]["candidates"]) or (record["phases"]["candidate scan"] < 0.51)
+        or (256 != record["keybits"])):
+        print("SEARCH METRICS FAILED!")
+        return False
+    return True
+
+Test_Search_Metrics()
+
 # 256-bit n
 n = 29865191353574605527576142154665662760069157332722232908944465250541370923717
 p = 105943264837628291368588115498666759579
@@ -38,6 +113,9 @@ print("pt=", pt)
 print("pt_out=", pt_out)
 
 Test_Mod_CRT(n, p, q)
+Test_Private_Key_CRT(n, p, q)
+Test_Modinv_Batch(n, p, q)
+Test_Mod_Multiplier(n)
 
 # 512 bit n
 n = 6020354501838682015849080079806375252444005783890216702874271917419622372892423281524120196835379431670180440627091319438156749830861865663944510389977981
@@ -58,6 +136,9 @@ print("pt=", pt)
 print("pt_out=", pt_out)
 
 Test_Mod_CRT(n, p, q)
+Test_Private_Key_CRT(n, p, q)
+Test_Modinv_Batch(n, p, q)
+Test_Mod_Multiplier(n)
 
 # 1024 bit n
 n = 3283820208958447696987943374117448908009765357285654693385347327161990683145362435055078968569512096812028089118865534433123727617331619214412173257331161
@@ -78,3 +159,12 @@ print("pt=", pt)
 print("pt_out=", pt_out)
 
 Test_Mod_CRT(n, p, q)
+Test_Private_Key_CRT(n, p, q)
+Test_Modinv_Batch(n, p, q)
+Test_Mod_Multiplier(n)
+
+# e^2 | p-1 for the bad prime of this key, so e and 2e need the discrete
+# logarithm root
+import RSATestCases
+e = RSATestCases.e
+Test_Eth_Root(RSATestCases.sq_bad_p1, [2, 6, e, 2*e, e*e, 3*e])
@@ -0,0 +1,159 @@
+#
+# RSAMultiSchemePlaintextSearch.py - Plaintext search for ciphertexts with an
+#                                    unknown padding scheme
+#
+# Copyright (c) Microsoft Corporation. Licensed under the MIT license.
+#
+# One pass over the candidate roots tests every candidate against PKCS1
+# v1.5 and against OAEP with each of a set of hash functions and labels, so
+# the modular candidate generation is not repeated once per scheme.
+#
+
+from RSAMath import *
+from RSAKeyContext import *
+from RSAPadding import *
+
+# A PlaintextResult tagged with the padding that matched: scheme is "pkcs1"
+# or "oaep", and for OAEP hashfn and label (None for the empty label) are
+# the hash function and label.
+class SchemeResult(PlaintextResult):
+    __slots__ = ("scheme", "hashfn", "label")
+
+    def __init__(self, plaintext, index, paddinglength, scheme, hashfn=None, label=None):
+        PlaintextResult.__init__(self, plaintext, index, paddinglength)
+        self.scheme = scheme
+        self.hashfn = hashfn
+        self.label = label
+
+    def __repr__(self):
+        return ("SchemeResult(plaintext=" + repr(self.plaintext) + ", index=" + str(self.index) +
+                ", paddinglength=" + str(self.paddinglength) + ", scheme=" + self.scheme +
+                ", hashfn=" + str(self.hashfn) + ", label=" + repr(self.label) + ")")
+
+    def to_dict(self):
+        pt_dict = PlaintextResult.to_dict(self)
+        pt_dict["scheme"] = self.scheme
+        if ("oaep" == self.scheme):
+            pt_dict["hash"] = self.hashfn
+            pt_dict["label"] = self.label
+        return pt_dict
+
+# Classifies decrypted candidates for the modulus N.  hashfns are the OAEP
+# hash functions to try (default allowed_hashes) and labels the OAEP labels
+# (default only the empty label, None).  Hash functions whose digests are
+# too long for the modulus are left out.
+#
+# The checks are ordered cheapest first.  Both schemes need a leading zero
+# byte.  PKCS1 v1.5 only needs a byte compare and a scan for the
+# separator.  For OAEP every hash function costs one hash of maskedDB for
+# the seed and one hash block for the start of DB, which is looked up in
+# the precomputed lHashes of all labels at once.  Only a candidate whose
+# lHash matches is decoded fully, with the OAEPCodec of that label.
+class SchemeClassifier:
+    def __init__(self, N, hashfns=None, labels=None, pkcs1=True):
+        if (None == hashfns):
+            hashfns = allowed_hashes
+        if (None == labels):
+            labels = [None]
+
+        self.N = N
+        self.bytelen = (N.bit_length() + 7)//8
+        self.pkcs1 = pkcs1
+        self.oaep = []
+        self.codecs = {}
+
+        # Shorter digests first, they are also the cheaper ones to compute.
+        for hashfn in sorted(hashfns, key=lambda h: (get_mgf1(h).hLen, h)):
+            mgf = get_mgf1(hashfn)
+            if (self.bytelen < 2*mgf.hLen + 2):
+                continue
+            lHashes = {}
+            for label in labels:
+                codec = OAEPCodec(N, hashfn, label)
+                self.codecs[(hashfn, label)] = codec
+                lHashes.setdefault(codec.lHash, label)
+            self.oaep.append((hashfn, mgf, lHashes))
+
+    # The candidate range that covers all the schemes.
+    def EM_range(self):
+        return RSAES_OAEP_EM_range(self.bytelen)
+
+    # Returns the list of (scheme, hashfn, label, M, paddinglength) matches
+    # for the candidate pt_hat from EM_range, usually empty.  The leading
+    # zero byte is not checked again, candidates outside EM_range are
+    # counted as "rejected: bad Y" by the scan.
+    def classify(self, pt_hat, metrics=None):
+        EM = pt_hat.to_bytes(self.bytelen, 'big')
+        matches = []
+
+        if (self.pkcs1 and (0x02 == EM[1])):
+            (paddingValid, j, ptLen) = RSAES_PKCS1_v15_PaddingCheck(EM)
+            if (paddingValid and (8 <= j)):
+                matches.append(("pkcs1", None, None, EM[j+3:], j))
+
+        for (hashfn, mgf, lHashes) in self.oaep:
+            hLen = mgf.hLen
+            buf = bytearray(EM[:2*hLen+1])
+            mgf.mask_into(buf, EM[hLen+1:], 1, hLen+1)
+            mgf.mask_into(buf, bytes(buf[1:hLen+1]), hLen+1, 2*hLen+1)
+            lHash = bytes(buf[hLen+1:])
+            if (lHash not in lHashes):
+                continue
+            label = lHashes[lHash]
+            (M, padding_correct) = self.codecs[(hashfn, label)].decode(EM, fail_fast=True)
+            if (padding_correct):
+                matches.append(("oaep", hashfn, label, M, None))
+
+        if ((None != metrics) and (0 == len(matches))):
+            metrics.count("rejected: no scheme")
+        return matches
+
+# Searches one ciphertext with a key context from get_key_context and a
+# SchemeClassifier for its modulus, yielding a SchemeResult as soon as each
+# valid plaintext is found.  Stops after max_results results.  Timings and
+# counts are added to metrics as in plaintext_search_iter.
+def RSAMultiScheme_plaintext_search_key_iter(ctx, ct, classifier, max_results=None, metrics=None):
+    if (None == metrics):
+        metrics = SearchMetrics()
+
+    (lo, hi) = classifier.EM_range()
+
+    with metrics.phase("private key ops"):
+        (zp, xq) = ctx.residues(ct)
+
+    classify = lambda i, pt_hat: [SchemeResult(M, i, paddinglength, scheme, hashfn, label) for
+                                  (scheme, hashfn, label, M, paddinglength) in classifier.classify(pt_hat, metrics)]
+    return plaintext_search_iter(ctx.scan(zp, xq, lo=lo, hi=hi), classify, ctx.r,
+                                 "rejected: bad Y", max_results, metrics)
+
+# Searches one ciphertext with a key context from get_key_context and
+# returns the list of all plaintext dicts, each tagged with its scheme.
+def RSAMultiScheme_plaintext_search_key(ctx, ct, classifier, metrics=None):
+    return [result.to_dict() for result in
+            RSAMultiScheme_plaintext_search_key_iter(ctx, ct, classifier, None, metrics)]
+
+def RSAMultiScheme_plaintext_search(p, q, e, ct, hashfns=None, labels=None, metrics=None):
+    ctx = get_key_context(p, q, e, metrics)
+    if (None == ctx):
+        return None
+    classifier = SchemeClassifier(ctx.N, hashfns, labels)
+    return RSAMultiScheme_plaintext_search_key(ctx, ct, classifier, metrics)
+
+# Searches every ciphertext in cts under the same key, sharing the key
+# context and the classifier.  Returns a generator of one plaintext list per
+# ciphertext, in input order, that only searches a ciphertext when its list
+# is taken.
+def RSAMultiScheme_plaintext_search_batch_iter(p, q, e, cts, hashfns=None, labels=None, metrics=None):
+    ctx = get_key_context(p, q, e, metrics)
+    if (None == ctx):
+        return None
+    classifier = SchemeClassifier(ctx.N, hashfns, labels)
+    return (RSAMultiScheme_plaintext_search_key(ctx, ct, classifier, metrics) for ct in cts)
+
+# Same as RSAMultiScheme_plaintext_search_batch_iter, but returns the list
+# of all plaintext lists.
+def RSAMultiScheme_plaintext_search_batch(p, q, e, cts, hashfns=None, labels=None, metrics=None):
+    pt_lists = RSAMultiScheme_plaintext_search_batch_iter(p, q, e, cts, hashfns, labels, metrics)
+    if (None == pt_lists):
+        return None
+    return list(pt_lists)
@@ -0,0 +1,59 @@
+#
+# RSAMultiSchemePlaintextSearchTest.py - Test for the multi-scheme plaintext search
+#
+# Copyright (c) Microsoft Corporation. Licensed under the MIT license.
+#
+
+from RSAMultiSchemePlaintextSearch import *
+from RSAOAEPPlaintextSearch import *
+from RSAPKCS1 import *
+
+import RSATestCases
+
+def test_multi_scheme_search(p, q, N, e, pt):
+    label = b'multi scheme label'
+    cases = [(RSAEncrypt_PKCS1(pt, N, e), ("pkcs1", None, None)),
+             (RSAEncrypt_OAEP(pt, N, e, 'sha256'), ("oaep", 'sha256', None)),
+             (RSAEncrypt_OAEP(pt, N, e, 'sha1', label), ("oaep", 'sha1', label)),
+             (RSAEncrypt_OAEP(pt, N, e, 'sha224'), ("oaep", 'sha224', None))]
+    cts = [int.from_bytes(ct, 'big') for (ct, _) in cases]
+
+    metrics = SearchMetrics()
+    pt_lists = RSAMultiScheme_plaintext_search_batch(p, q, e, cts, allowed_hashes, [None, label], metrics)
+    for ((_, (scheme, hashfn, L)), pt_list) in zip(cases, pt_lists):
+        found = [(d["scheme"], d.get("hash"), d.get("label")) for d in pt_list
+                 if (int.from_bytes(pt, 'big') == d["plaintext"])]
+        if ([(scheme, hashfn, L)] != found):
+            print("Multi-scheme search " + scheme + " " + str(hashfn) + " FAILED.")
+            return False
+
+    if (len(cts)*get_key_context(p, q, e).r != metrics.counts["candidates"]):
+        print("Multi-scheme search metrics FAILED.")
+        return False
+
+    # Same results as the single scheme search.
+    ctx = get_key_context(p, q, e)
+    classifier = SchemeClassifier(N, ['sha256'], pkcs1=False)
+    multi = [(d["plaintext"], d["plaintextlength"]) for d in RSAMultiScheme_plaintext_search_key(ctx, cts[1], classifier)]
+    single = [(d["plaintext"], d["plaintextlength"]) for d in RSAOAEP_plaintext_search_key(ctx, cts[1], 'sha256')]
+    if (multi != single):
+        print("Multi-scheme search against OAEP search FAILED.")
+        return False
+
+    # Without PKCS1 v1.5, whose false positives could come first.
+    classifier = SchemeClassifier(N, pkcs1=False)
+    results = list(RSAMultiScheme_plaintext_search_key_iter(ctx, cts[3], classifier, max_results=1))
+    if ((1 != len(results)) or (pt != results[0].plaintext) or ('sha224' != results[0].hashfn)):
+        print("Multi-scheme streaming search FAILED.")
+        return False
+
+    print("PASSED.")
+    return True
+
+if __name__ == "__main__":
+    pt = RSATestCases.pt
+
+    for bad_prvk in RSATestCases.bad_priv_keys[:2] + RSATestCases.gen_bad_priv_keys:
+        print("RSA multi-scheme plaintext search " + str(bad_prvk["bitlength"]) + "bit test case with e = " + str(bad_prvk["e"]) + ":\n")
+        test_multi_scheme_search(bad_prvk["p"], bad_prvk["q"], bad_prvk["N"], bad_prvk["e"], pt)
+        print("\n")
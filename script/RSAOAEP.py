@@ -17,18 +17,31 @@ def RSAEncrypt_OAEP(pt, n, e, hashfn, OAEPLabel=None):
     return ct.to_bytes(bytelen, 'big')
 
 def RSADecrypt_OAEP(ct, p, q, d, hashfn, OAEPLabel=None):
+    return RSADecrypt_OAEP_key(ct, RSAPrivateKeyCRT(p, q, d), hashfn, OAEPLabel)
+
+# Decrypts with an RSAPrivateKeyCRT, see make_private_key_crt.
+def RSADecrypt_OAEP_key(ct, key, hashfn, OAEPLabel=None):
     if (str != type(hashfn)):
         raise TypeError("Hash function argument hashfn must be type str.")
-    ict = int.from_bytes(ct, 'big')
-    n = p*q
-    ipt = pow(ict, d, n)
-    bytelen = (n.bit_length()+7)//8
-    pt_padded = ipt.to_bytes(bytelen, 'big')
-    (pt, padding_correct) = RSAES_OAEP_EME_Decode(n, pt_padded, OAEPLabel, hashfn)
+    ipt = key.decrypt(int.from_bytes(ct, 'big'))
+    pt_padded = ipt.to_bytes(key.bytelen, 'big')
+    (pt, padding_correct) = RSAES_OAEP_EME_Decode(key.N, pt_padded, OAEPLabel, hashfn)
     if (not padding_correct):
         raise ValueError("Decrypted plaintext padding was incorrect.")
     return pt
 
+# Decrypts every ciphertext in cts with an RSAPrivateKeyCRT and returns the
+# plaintexts in order.  Raises ValueError if any padding is incorrect.
+def RSADecrypt_OAEP_many(cts, key, hashfn, OAEPLabel=None):
+    codec = OAEPCodec(key.N, hashfn, OAEPLabel)
+    ipts = key.decrypt_many([int.from_bytes(ct, 'big') for ct in cts])
+    pts = []
+    for (pt, padding_correct) in codec.decode_many([ipt.to_bytes(key.bytelen, 'big') for ipt in ipts]):
+        if (not padding_correct):
+            raise ValueError("Decrypted plaintext padding was incorrect.")
+        pts.append(pt)
+    return pts
+
 def Test_RSA_OAEP(p,q,N,e,d,pt,hashfn):
     ct = RSAEncrypt_OAEP(pt, N, e, hashfn)
     pt_out = RSADecrypt_OAEP(ct, p, q, d, hashfn)
@@ -37,3 +50,10 @@ def Test_RSA_OAEP(p,q,N,e,d,pt,hashfn):
     else:
         print("FAILED.")
 
+def Test_RSA_OAEP_many(prvk, pts, hashfn):
+    key = make_private_key_crt(prvk)
+    cts = [RSAEncrypt_OAEP(pt, prvk["N"], prvk["e"], hashfn) for pt in pts]
+    if (pts == RSADecrypt_OAEP_many(cts, key, hashfn)):
+        print("PASSED.")
+    else:
+        print("FAILED.")
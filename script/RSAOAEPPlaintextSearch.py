@@ -6,71 +6,97 @@
 
 
 from RSAMath import *
+from RSAKeyContext import *
 from RSAPadding import *
 from RSAOAEP import*
 
-def RSAOAEP_plaintext_search(p,q,e,ct, hashfn):
-    if (((2**16)+1) < e):
-        print("ERROR: Supplied public exponent is larger than Fermat-4.")
+# Returns (M, None) for a candidate with valid padding, else None.
+# metrics, if given, counts the rejection reason and the decode time.  An
+# OAEPCodec for N and hashfn can be passed in to reuse it across candidates.
+def RSAOAEP_decode_candidate(pt_hat, N, bytelen, hashfn, metrics=None, codec=None):
+    if (None == codec):
+        codec = OAEPCodec(N, hashfn)
+    if (None == metrics):
+        ptb = pt_hat.to_bytes(bytelen , 'big')
+        (pt, paddingValid) = codec.decode(ptb, fail_fast=True)
+    else:
+        with metrics.phase("decode"):
+            ptb = pt_hat.to_bytes(bytelen , 'big')
+            (pt, paddingValid) = codec.decode(ptb, fail_fast=True, metrics=metrics)
+    if (paddingValid):
+        return (pt, None)
+    return None
+
+# Returns the plaintext dict for a candidate with valid padding, else None.
+def RSAOAEP_check_candidate(pt_hat, N, bytelen, hashfn, metrics=None, codec=None):
+    decoded = RSAOAEP_decode_candidate(pt_hat, N, bytelen, hashfn, metrics, codec)
+    if (None == decoded):
         return None
-
-    N = p*q
-    phi_N = (p-1)*(q-1)
-
-    if (0 != (phi_N % e)):
-        print("ERROR: (p-1)(q-1) is not divisible by the exponent.")
+    pt = decoded[0]
+    return {"plaintext":int.from_bytes(pt, 'big'), "plaintextlength":len(pt)}
+
+# Searches one ciphertext with a key context from get_key_context, yielding
+# a PlaintextResult as soon as each valid plaintext is found.  Stops after
+# max_results results (max_results=1 stops at the first hit).  Timings and
+# counts are added to metrics if a SearchMetrics object is passed.
+def RSAOAEP_plaintext_search_key_iter(ctx, ct, hashfn, max_results=None, metrics=None):
+    if (None == metrics):
+        metrics = SearchMetrics()
+
+    N = ctx.N
+    bytelen = ctx.bytelen
+    (lo, hi) = RSAES_OAEP_EM_range(bytelen)
+    codec = OAEPCodec(N, hashfn)
+
+    with metrics.phase("private key ops"):
+        (zp, xq) = ctx.residues(ct)
+
+    decode = lambda pt_hat: RSAOAEP_decode_candidate(pt_hat, N, bytelen, hashfn, metrics, codec)
+    return plaintext_search_iter(ctx.scan(zp, xq, lo=lo, hi=hi), decode_classifier(decode), ctx.r,
+                                 "rejected: bad Y", max_results, metrics)
+
+# Searches one ciphertext with a key context from get_key_context and
+# returns the list of all plaintext dicts.
+def RSAOAEP_plaintext_search_key(ctx, ct, hashfn, metrics=None):
+    return [result.to_dict() for result in RSAOAEP_plaintext_search_key_iter(ctx, ct, hashfn, None, metrics)]
+
+def RSAOAEP_plaintext_search_iter(p, q, e, ct, hashfn, max_results=None, metrics=None):
+    ctx = get_key_context(p, q, e, metrics)
+    if (None == ctx):
         return None
+    return RSAOAEP_plaintext_search_key_iter(ctx, ct, hashfn, max_results, metrics)
 
-    if (0 == (phi_N % (e*e))):
-        print("ERROR: (p-1)(q-1) is divisible by the square of the public exponent.")
-        return None
-    
-    phihat_N = phi_N//e
-
-    bytelen = (N.bit_length() + 7)//8
-    print("RSA Key Byte Length: " + str(bytelen))
-    print(phihat_N)
-
-    d = modinv(e,phihat_N)
-
-    print(phi_N)
-    print(phi_N//e)
+def RSAOAEP_plaintext_search(p,q,e,ct, hashfn, metrics=None):
+    if (None == metrics):
+        metrics = SearchMetrics()
 
-    print(xgcd(e,phihat_N))
-    print(phihat_N % e)
+    ctx = get_key_context(p, q, e, metrics)
+    if (None == ctx):
+        return None
 
-    print("Searching for good generator...");
-    with Timer() as t:
-        g = find_generator(e,phihat_N,N)
-    print("Good generator found in " + str(t.interval) + " seconds.");
+    print("RSA Key Byte Length: " + str(ctx.bytelen))
 
-    print(g)
+    pt_list = RSAOAEP_plaintext_search_key(ctx, ct, hashfn, metrics)
 
-    with Timer() as t:
-        (Mp,Mq) = rsa_crt_precompute(p,q)
-        g_e_torsion = rsa_crt_mod_exp(g, phihat_N, p, q, Mp, Mq)
-        z = rsa_crt_mod_exp(ct, d, p, q, Mp, Mq)
-    print("private key operations done in " + str(t.interval) + " seconds.");
+    print("Plaintext search finished in " + str(metrics.phases["candidate scan"]) + " seconds.");
 
-    print("g of e torsion group = " + str(g_e_torsion))
+    return pt_list
 
-    pt_list = []
+# Searches every ciphertext in cts under the same key, sharing the cached
+# key context.  Returns a generator of one plaintext list per ciphertext, in
+# input order, that only searches a ciphertext when its list is taken, so
+# cts may be a stream such as RSACiphertextInput.ciphertext_ints.
+def RSAOAEP_plaintext_search_batch_iter(p, q, e, cts, hashfn, metrics=None):
+    ctx = get_key_context(p, q, e, metrics)
+    if (None == ctx):
+        return None
 
-    print("Searching for plaintext...")
-    with Timer() as t:
-        i = 1
-        ell = g_e_torsion
-        while (i < e):
-            pt_hat = ell*z % N
-            ptb = pt_hat.to_bytes(bytelen , 'big')
-            (pt, paddingValid) = RSAES_OAEP_EME_Decode(N, ptb, None, hashfn)
-            if (paddingValid):
-                print("plaintext found.")
-                pti = int.from_bytes(pt, 'big')
-                pt_dict = {"plaintext":pti, "plaintextlength":len(pt)}
-                pt_list.append(pt_dict)
-            i = i + 1
-            ell = ell*g_e_torsion % N
-    print("Plaintext search finished in " + str(t.interval) + " seconds.");
+    return (RSAOAEP_plaintext_search_key(ctx, ct, hashfn, metrics) for ct in cts)
 
-    return pt_list
+# Same as RSAOAEP_plaintext_search_batch_iter, but returns the list of all
+# plaintext lists.
+def RSAOAEP_plaintext_search_batch(p, q, e, cts, hashfn, metrics=None):
+    pt_lists = RSAOAEP_plaintext_search_batch_iter(p, q, e, cts, hashfn, metrics)
+    if (None == pt_lists):
+        return None
+    return list(pt_lists)
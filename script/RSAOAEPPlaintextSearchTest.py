@@ -19,6 +19,33 @@ def test_oaep_plaintext_search(p, q, N, e, pt, hashfn):
     pt_list = RSAOAEP_plaintext_search(p, q, e, cti, hashfn)
     print_pt_list(pt_list)
 
+def test_oaep_plaintext_search_batch(p, q, N, e, pts, hashfn):
+    cts = [int.from_bytes(RSAEncrypt_OAEP(pt, N, e, hashfn), 'big') for pt in pts]
+    metrics = SearchMetrics()
+    pt_lists = RSAOAEP_plaintext_search_batch(p, q, e, cts, hashfn, metrics)
+    for (pt, pt_list) in zip(pts, pt_lists):
+        print_pt_list(pt_list)
+        found = [pt_dict["plaintext"] for pt_dict in pt_list]
+        if (int.from_bytes(pt, 'big') in found):
+            print("PASSED.")
+        else:
+            print("FAILED.")
+    counts = metrics.counts
+    if ((len(pts)*get_key_context(p, q, e).r != counts["candidates"]) or (counts["candidates"] != counts["survivors"] + counts["rejected: bad Y"])):
+        print("Search metrics FAILED.")
+    print(metrics.to_json_line())
+
+def test_plaintext_search_iter(p, q, N, e, pt, hashfn):
+    ct = RSAEncrypt_OAEP(pt, N, e, hashfn)
+    cti = int.from_bytes(ct, 'big')
+    pt_list = RSAOAEP_plaintext_search_key(get_key_context(p, q, e), cti, hashfn)
+    results = list(RSAOAEP_plaintext_search_iter(p, q, e, cti, hashfn, max_results=1))
+    if ((1 != len(results)) or (results[0].to_dict() != pt_list[0])):
+        print("FAILED.")
+        return False
+    print("PASSED.")
+    return True
+
 import RSATestCases
 
 pt = RSATestCases.pt
@@ -38,3 +65,20 @@ for bad_prvk in RSATestCases.bad_priv_keys:
         test_oaep_plaintext_search(p,q,N,e,pt, hashfn)
         print("\n\n")
 
+bad_prvk = RSATestCases.bad_priv_keys[0]
+print("RSA OAEP batch plaintext search " + str(bad_prvk["bitlength"]) + "bit test case with sha256:\n")
+test_oaep_plaintext_search_batch(bad_prvk["p"], bad_prvk["q"], bad_prvk["N"], bad_prvk["e"], [pt, pt[::-1], pt[:16]], 'sha256')
+print("\n\n")
+print("RSA OAEP streaming plaintext search " + str(bad_prvk["bitlength"]) + "bit test case with sha256:\n")
+test_plaintext_search_iter(bad_prvk["p"], bad_prvk["q"], bad_prvk["N"], bad_prvk["e"], pt, 'sha256')
+print("\n\n")
+
+for bad_prvk in RSATestCases.gen_bad_priv_keys:
+    print("RSA OAEP batch plaintext search " + str(bad_prvk["bitlength"]) + "bit test case with e = " + str(bad_prvk["e"]) + " and sha256:\n")
+    test_oaep_plaintext_search_batch(bad_prvk["p"], bad_prvk["q"], bad_prvk["N"], bad_prvk["e"], [pt, pt[::-1], pt[:16]], 'sha256')
+    print("\n\n")
+
+for bad_prvk in RSATestCases.sq_bad_priv_keys:
+    print("RSA OAEP batch plaintext search " + str(bad_prvk["bitlength"]) + "bit test case with e^2 | p-1 and sha256:\n")
+    test_oaep_plaintext_search_batch(bad_prvk["p"], bad_prvk["q"], bad_prvk["N"], bad_prvk["e"], [pt, pt[::-1], pt[:16]], 'sha256')
+    print("\n\n")
@@ -25,3 +25,5 @@ for prvk in RSATestCases.valid_priv_keys:
         if (len(pt) >= nl - 2*(dl+1)):
             continue
         Test_RSA_OAEP(p, q, N, e, d, pt, hashfn)
+
+    Test_RSA_OAEP_many(prvk, [pt, pt[:1], b''], "sha1")
@@ -15,14 +15,21 @@ def RSAEncrypt_PKCS1(pt, n, e):
     return ct.to_bytes(bytelen, 'big')
 
 def RSADecrypt_PKCS1(ct, p, q, d):
-    ict = int.from_bytes(ct, 'big')
-    n = p*q
-    ipt = pow(ict, d, n)
-    bytelen = (n.bit_length()+7)//8
-    pt_padded = ipt.to_bytes(bytelen, 'big')
+    return RSADecrypt_PKCS1_key(ct, RSAPrivateKeyCRT(p, q, d))
+
+# Decrypts with an RSAPrivateKeyCRT, see make_private_key_crt.
+def RSADecrypt_PKCS1_key(ct, key):
+    ipt = key.decrypt(int.from_bytes(ct, 'big'))
+    pt_padded = ipt.to_bytes(key.bytelen, 'big')
     pt = RSAES_PKCS1_v15_Decode(pt_padded)
     return pt
 
+# Decrypts every ciphertext in cts with an RSAPrivateKeyCRT and returns the
+# plaintexts in order.
+def RSADecrypt_PKCS1_many(cts, key):
+    ipts = key.decrypt_many([int.from_bytes(ct, 'big') for ct in cts])
+    return [RSAES_PKCS1_v15_Decode(ipt.to_bytes(key.bytelen, 'big')) for ipt in ipts]
+
 def Test_RSA_PKCS1(p,q,N,e,d,pt):
     ct = RSAEncrypt_PKCS1(pt, N, e)
     pt_out = RSADecrypt_PKCS1(ct, p, q, d)
@@ -31,3 +38,10 @@ def Test_RSA_PKCS1(p,q,N,e,d,pt):
     else:
         print("FAILED.")
 
+def Test_RSA_PKCS1_many(prvk, pts):
+    key = make_private_key_crt(prvk)
+    cts = [RSAEncrypt_PKCS1(pt, prvk["N"], prvk["e"]) for pt in pts]
+    if (pts == RSADecrypt_PKCS1_many(cts, key)):
+        print("PASSED.")
+    else:
+        print("FAILED.")
@@ -5,71 +5,99 @@
 #
 
 from RSAMath import *
+from RSAKeyContext import *
 from RSAPadding import *
 from RSAPKCS1 import *
 
-def RSAPKCS1_plaintext_search(p,q,e,ct):
-    if (((2**16)+1) < e):
-        print("ERROR: Supplied public exponent is larger than Fermat-4.")
+# Returns (M, paddinglength) for a candidate with valid padding, else None.
+# metrics, if given, counts the rejection reason and the decode time.
+def RSAPKCS1_decode_candidate(pt_hat, bytelen, metrics=None):
+    if (None == metrics):
+        ptb = pt_hat.to_bytes(bytelen , 'big')
+        (paddingValid, j, ptLen)=RSAES_PKCS1_v15_PaddingCheck(ptb)
+    else:
+        with metrics.phase("decode"):
+            ptb = pt_hat.to_bytes(bytelen , 'big')
+            (paddingValid, j, ptLen)=RSAES_PKCS1_v15_PaddingCheck(ptb)
+        if (not paddingValid):
+            if ((0x00 != ptb[0]) or (0x02 != ptb[1])):
+                metrics.count("rejected: bad prefix")
+            elif (-1 == ptb.find(0x00, 2)):
+                metrics.count("rejected: missing separator")
+            else:
+                metrics.count("rejected: short padding")
+    if (paddingValid and (8 <= j)):
+        return (RSAES_PKCS1_v15_Decode(ptb), j)
+    return None
+
+# Returns the plaintext dict for a candidate with valid padding, else None.
+def RSAPKCS1_check_candidate(pt_hat, bytelen, metrics=None):
+    decoded = RSAPKCS1_decode_candidate(pt_hat, bytelen, metrics)
+    if (None == decoded):
         return None
+    (M, j) = decoded
+    return {"plaintext":int.from_bytes(M, 'big'), "paddinglength":j, "plaintextlength":len(M)}
+
+# Searches one ciphertext with a key context from get_key_context, yielding
+# a PlaintextResult as soon as each valid plaintext is found.  Stops after
+# max_results results (max_results=1 stops at the first hit).  Timings and
+# counts are added to metrics if a SearchMetrics object is passed.
+def RSAPKCS1_plaintext_search_key_iter(ctx, ct, max_results=None, metrics=None):
+    if (None == metrics):
+        metrics = SearchMetrics()
+
+    bytelen = ctx.bytelen
+    (lo, hi) = RSAES_PKCS1_v15_EM_range(bytelen)
+
+    with metrics.phase("private key ops"):
+        (zp, xq) = ctx.residues(ct)
+
+    decode = lambda pt_hat: RSAPKCS1_decode_candidate(pt_hat, bytelen, metrics)
+    return plaintext_search_iter(ctx.scan(zp, xq, lo=lo, hi=hi), decode_classifier(decode), ctx.r,
+                                 "rejected: bad prefix", max_results, metrics)
+
+# Searches one ciphertext with a key context from get_key_context and
+# returns the list of all plaintext dicts.
+def RSAPKCS1_plaintext_search_key(ctx, ct, metrics=None):
+    return [result.to_dict() for result in RSAPKCS1_plaintext_search_key_iter(ctx, ct, None, metrics)]
+
+def RSAPKCS1_plaintext_search_iter(p, q, e, ct, max_results=None, metrics=None):
+    ctx = get_key_context(p, q, e, metrics)
+    if (None == ctx):
+        return None
+    return RSAPKCS1_plaintext_search_key_iter(ctx, ct, max_results, metrics)
 
-    N = p*q
-    phi_N = (p-1)*(q-1)
-
-    if (0 != (phi_N % e)):
-        print("ERROR: (p-1)(q-1) is not divisible by the exponent.")
-
-    if (0 == (phi_N % (e*e))):
-        print("ERROR: (p-1)(q-1) is divisible by the square of the public exponent.")
-
-    phihat_N = phi_N//e
-
-    bytelen = (N.bit_length() + 7)//8
-    print("RSA Key Byte Length: " + str(bytelen))
-    print(phihat_N)
-
-    d = modinv(e,phihat_N)
-
-    print(phi_N)
-    print(phi_N//e)
-
-    print(xgcd(e,phihat_N))
-    print(phihat_N % e)
+def RSAPKCS1_plaintext_search(p,q,e,ct, metrics=None):
+    if (None == metrics):
+        metrics = SearchMetrics()
 
-    print("Searching for good generator...");
-    with Timer() as t:
-        g = find_generator(e,phihat_N,N)
-    print("Good generator found in " + str(t.interval) + " seconds.");
+    ctx = get_key_context(p, q, e, metrics)
+    if (None == ctx):
+        return None
 
-    print(g)
+    print("RSA Key Byte Length: " + str(ctx.bytelen))
 
-    with Timer() as t:
-        (Mp,Mq) = rsa_crt_precompute(p,q)
-        g_e_torsion = rsa_crt_mod_exp(g, phihat_N, p, q, Mp, Mq)
-        z = rsa_crt_mod_exp(ct, d, p, q, Mp, Mq)
-    print("private key operations done in " + str(t.interval) + " seconds.");
+    pt_list = RSAPKCS1_plaintext_search_key(ctx, ct, metrics)
 
-    print("g of e torsion group = " + str(g_e_torsion))
+    print("Plaintext search finished in " + str(metrics.phases["candidate scan"]) + " seconds.");
 
-    pt_list = []
+    return pt_list
 
-    print("Searching for plaintext...")
-    with Timer() as t:
-        i = 1
-        ell = g_e_torsion
-        while (i < e):
-            pt_hat = ell*z % N
-            ptb = pt_hat.to_bytes(bytelen , 'big')
-            (paddingValid, j, ptLen)=RSAES_PKCS1_v15_PaddingCheck(ptb)
-            if (paddingValid and (8 <= j)):
-                print("plaintext found.")
-                M = RSAES_PKCS1_v15_Decode(ptb)
-                pti = int.from_bytes(M, 'big')
-                pt_dict = {"plaintext":pti, "paddinglength":j, "plaintextlength":ptLen}
-                pt_list.append(pt_dict)
-            i = i + 1
-            ell = ell*g_e_torsion % N
-    print("Plaintext search finished in " + str(t.interval) + " seconds.");
+# Searches every ciphertext in cts under the same key, sharing the cached
+# key context.  Returns a generator of one plaintext list per ciphertext, in
+# input order, that only searches a ciphertext when its list is taken, so
+# cts may be a stream such as RSACiphertextInput.ciphertext_ints.
+def RSAPKCS1_plaintext_search_batch_iter(p, q, e, cts, metrics=None):
+    ctx = get_key_context(p, q, e, metrics)
+    if (None == ctx):
+        return None
 
-    return pt_list
+    return (RSAPKCS1_plaintext_search_key(ctx, ct, metrics) for ct in cts)
 
+# Same as RSAPKCS1_plaintext_search_batch_iter, but returns the list of all
+# plaintext lists.
+def RSAPKCS1_plaintext_search_batch(p, q, e, cts, metrics=None):
+    pt_lists = RSAPKCS1_plaintext_search_batch_iter(p, q, e, cts, metrics)
+    if (None == pt_lists):
+        return None
+    return list(pt_lists)
@@ -21,6 +21,33 @@ def test_plaintext_search(p, q, N, e, pt):
     pt_list = RSAPKCS1_plaintext_search(p, q, e, cti)
     print_pt_list(pt_list)
 
+def test_plaintext_search_batch(p, q, N, e, pts):
+    cts = [int.from_bytes(RSAEncrypt_PKCS1(pt, N, e), 'big') for pt in pts]
+    metrics = SearchMetrics()
+    pt_lists = RSAPKCS1_plaintext_search_batch(p, q, e, cts, metrics)
+    for (pt, pt_list) in zip(pts, pt_lists):
+        print_pt_list(pt_list)
+        found = [pt_dict["plaintext"] for pt_dict in pt_list]
+        if (int.from_bytes(pt, 'big') in found):
+            print("PASSED.")
+        else:
+            print("FAILED.")
+    counts = metrics.counts
+    if ((len(pts)*get_key_context(p, q, e).r != counts["candidates"]) or (counts["candidates"] != counts["survivors"] + counts["rejected: bad prefix"])):
+        print("Search metrics FAILED.")
+    print(metrics.to_json_line())
+
+def test_plaintext_search_iter(p, q, N, e, pt):
+    ct = RSAEncrypt_PKCS1(pt, N, e)
+    cti = int.from_bytes(ct, 'big')
+    pt_list = RSAPKCS1_plaintext_search_key(get_key_context(p, q, e), cti)
+    results = list(RSAPKCS1_plaintext_search_iter(p, q, e, cti, max_results=1))
+    if ((1 != len(results)) or (results[0].to_dict() != pt_list[0])):
+        print("FAILED.")
+        return False
+    print("PASSED.")
+    return True
+
 import RSATestCases
 
 pt = RSATestCases.pt
@@ -34,3 +61,21 @@ for bad_prvk in RSATestCases.bad_priv_keys:
     print("RSA PKCS1 plaintext search " + str(bitlen) + "bit test case:\n")
     test_plaintext_search(p,q,N,e,pt)
     print("\n\n")
+
+bad_prvk = RSATestCases.bad_priv_keys[0]
+print("RSA PKCS1 batch plaintext search " + str(bad_prvk["bitlength"]) + "bit test case:\n")
+test_plaintext_search_batch(bad_prvk["p"], bad_prvk["q"], bad_prvk["N"], bad_prvk["e"], [pt, pt[::-1], pt[:16]])
+print("\n\n")
+print("RSA PKCS1 streaming plaintext search " + str(bad_prvk["bitlength"]) + "bit test case:\n")
+test_plaintext_search_iter(bad_prvk["p"], bad_prvk["q"], bad_prvk["N"], bad_prvk["e"], pt)
+print("\n\n")
+
+for bad_prvk in RSATestCases.gen_bad_priv_keys:
+    print("RSA PKCS1 batch plaintext search " + str(bad_prvk["bitlength"]) + "bit test case with e = " + str(bad_prvk["e"]) + ":\n")
+    test_plaintext_search_batch(bad_prvk["p"], bad_prvk["q"], bad_prvk["N"], bad_prvk["e"], [pt, pt[::-1], pt[:16]])
+    print("\n\n")
+
+for bad_prvk in RSATestCases.sq_bad_priv_keys:
+    print("RSA PKCS1 batch plaintext search " + str(bad_prvk["bitlength"]) + "bit test case with e^2 | p-1:\n")
+    test_plaintext_search_batch(bad_prvk["p"], bad_prvk["q"], bad_prvk["N"], bad_prvk["e"], [pt, pt[::-1], pt[:16]])
+    print("\n\n")
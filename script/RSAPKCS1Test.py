@@ -20,3 +20,4 @@ for prvk in RSATestCases.valid_priv_keys:
     pt = RSATestCases.pt
     
     Test_RSA_PKCS1(p, q, N, e, d, pt)
+    Test_RSA_PKCS1_many(prvk, [pt, pt[:1], b''])
@@ -4,9 +4,51 @@
 # Copyright (c) Microsoft Corporation. Licensed under the MIT license.
 #
 
-import secrets
 import hashlib
 import math
+import os
+import threading
+
+# Per thread pool of random bytes from the OS CSPRNG, refilled refill_size
+# bytes at a time so that padding and seeds do not cost a system call each.
+# The pool is emptied in a forked child, so parent and child never hand out
+# the same bytes.
+class RandomPool(threading.local):
+    refill_size = 1 << 16
+
+    def __init__(self):
+        self.reset()
+
+    def reset(self):
+        self.buf = b''
+        self.pos = 0
+
+    def read(self, n):
+        if (self.pos + n > len(self.buf)):
+            self.buf = os.urandom(max(self.refill_size, n))
+            self.pos = 0
+        out = self.buf[self.pos:self.pos+n]
+        self.pos = self.pos + n
+        return out
+
+    # n random bytes, none of them zero.  Zero bytes are removed with one
+    # bytes.replace and the shortfall is read again.
+    def read_nonzero(self, n):
+        out = self.read(n).replace(b'\x00', b'')
+        while (len(out) < n):
+            out = out + self.read(n - len(out)).replace(b'\x00', b'')
+        return out
+
+random_pool = RandomPool()
+
+if (hasattr(os, "register_at_fork")):
+    os.register_at_fork(after_in_child=random_pool.reset)
+
+def random_bytes(n):
+    return random_pool.read(n)
+
+def random_nonzero_bytes(n):
+    return random_pool.read_nonzero(n)
 
 def RSAES_PKCS1_v15_Encode(n, e, M):
 
@@ -24,21 +66,17 @@ def RSAES_PKCS1_v15_Encode(n, e, M):
 
     padLen = k - mLen - 3
 
-    PS = bytearray(secrets.randbits(8*padLen).to_bytes(padLen, "big"))
+    PS = random_nonzero_bytes(padLen)
 
-    for i in range(padLen):
-        while (0 == PS[i]):
-            PS[i] = secrets.randbits(8)
+    # EM = 0x00 || 0x02 || PS || 0x00 || M
+    return b'\x00\x02' + PS + b'\x00' + M
 
-    EM = bytearray(k)
 
-    EM[0] = 0x00
-    EM[1] = 0x02
-    EM[2:1+padLen] = PS
-    EM[padLen+2] = 0x00
-    EM[padLen+3:] = M
-
-    return bytes(EM)
+# Range [lo, hi) of the integers whose k byte encoding starts with 0x00 0x02.
+# Used to reject candidates before converting them to bytes.
+def RSAES_PKCS1_v15_EM_range(k):
+    B = 2**(8*(k-2))
+    return (2*B, 3*B)
 
 
 def RSAES_PKCS1_v15_PaddingCheck(EM):
@@ -91,6 +129,70 @@ def RSAES_PKCS1_v15_Decode(EM):
 
 allowed_hashes = {'md5', 'sha384', 'sha3_256', 'sha3_384', 'sha512', 'blake2s', 'sha1', 'sha3_512', 'sha256', 'sha224', 'blake2b', 'sha3_224'}
 
+# hashlib constructors for allowed_hashes, resolved once instead of going
+# through hashlib.new by name on every call.
+hash_constructors = dict([(hashfn, getattr(hashlib, hashfn)) for hashfn in allowed_hashes])
+
+# 4 byte big endian MGF1 counters, enough for masks of 256 hash blocks.
+_mgf1_counters = [counter.to_bytes(4, 'big') for counter in range(256)]
+
+# XORs mask into buffer[start:start+len(mask)] in place.
+def xor_into(buffer, start, mask):
+    stop = start + len(mask)
+    x = int.from_bytes(buffer[start:stop], 'big') ^ int.from_bytes(mask, 'big')
+    buffer[start:stop] = x.to_bytes(len(mask), 'big')
+
+# MGF1 with a pre-resolved hash constructor.  The arguments are only checked
+# once, in the constructor, so this is meant for internal calls in loops.
+# Use get_mgf1 to share one instance per hash function.
+class MGF1:
+    def __init__(self, hashfn):
+        if (str != type(hashfn)):
+            raise TypeError("Hash function argument hashfn must be type str.")
+        if (hashfn not in allowed_hashes):
+            raise ValueError("Hash function argument hashfn must be a gauranteed algorithm in hashlib.")
+        self.hashfn = hashfn
+        self.hash = hash_constructors[hashfn]
+        self.hLen = self.hash().digest_size
+        # lHash of the empty label
+        self.lHash = self.hash().digest()
+
+    # Returns maskLen bytes of MGF1(mgfSeed), starting at hash block number
+    # block (block*hLen bytes into the full mask).
+    def mask(self, mgfSeed, maskLen, block=0):
+        h = self.hash(mgfSeed)
+        hLen = self.hLen
+        stop = block + (maskLen + hLen - 1)//hLen
+        if (stop <= len(_mgf1_counters)):
+            counters = _mgf1_counters[block:stop]
+        else:
+            counters = [counter.to_bytes(4, 'big') for counter in range(block, stop)]
+        T = []
+        for C in counters:
+            h2 = h.copy()
+            h2.update(C)
+            T.append(h2.digest())
+        T = b''.join(T)
+        if (maskLen == len(T)):
+            return T
+        return T[:maskLen]
+
+    # XORs MGF1(mgfSeed) into buffer[start:stop] in place, the mask starting
+    # at hash block number block.
+    def mask_into(self, buffer, mgfSeed, start=0, stop=None, block=0):
+        if (None == stop):
+            stop = len(buffer)
+        xor_into(buffer, start, self.mask(mgfSeed, stop - start, block))
+
+_mgf1_cache = {}
+
+def get_mgf1(hashfn):
+    mgf = _mgf1_cache.get(hashfn)
+    if (None == mgf):
+        mgf = MGF1(hashfn)
+        _mgf1_cache[hashfn] = mgf
+    return mgf
+
 def RSAES_PKCS1_v22_OAEP_MGF1(mgfSeed, maskLen, hashfn):
     if (bytes != type(mgfSeed)):
         raise TypeError("Mask generation seed argument mgfSeed must be type bytes.")
@@ -101,103 +203,202 @@ def RSAES_PKCS1_v22_OAEP_MGF1(mgfSeed, maskLen, hashfn):
     if (hashfn not in allowed_hashes):
         raise ValueError("Hash function argument hashfn must be a gauranteed algorithm in hashlib.")
 
-    h = hashlib.new(hashfn)
-    hLen = h.digest_size
+    mgf = get_mgf1(hashfn)
 
-    if ((2**32)*hLen < maskLen):
+    if ((2**32)*mgf.hLen < maskLen):
         raise ValueError("Mask length argument masklen must be at most (2^32)*hashLen. (mask too long)")
 
-    h.update(mgfSeed)
+    return mgf.mask(mgfSeed, maskLen)
+    
 
-    T = bytearray()
+# OAEP encoding and decoding for one modulus, hash function and label.  k,
+# hLen and lHash are computed once in the constructor, so encode and decode
+# only do the MGF1 and XOR work.  The arguments of encode and decode are not
+# type checked, use RSAES_OAEP_EME_Encode and RSAES_OAEP_EME_Decode for that.
+class OAEPCodec:
+    def __init__(self, n, hashfn, L=None):
+        if (int != type(n)):
+            raise TypeError("Public key argument n must be type int.")
+        if ((None != L) and (bytes != type(L))):
+            raise TypeError("Optional Label argument L must be None or type class bytes.")
+
+        self.mgf = get_mgf1(hashfn)
+        self.hashfn = hashfn
+        self.n = n
+        self.k = (n.bit_length() + 7)//8
+        self.hLen = self.mgf.hLen
+
+        # step 1a
+        if ((None != L) and ((2**61 - 1) < len(L))):
+            raise ValueError("Optional Label argument L must be at most 2**61 - 1 bytes long.  label too long.")
+
+        # step 1c of the decoding
+        if (self.k < (2*self.hLen + 2)):
+            raise ValueError("modulus_length must be >= 2*hash_digest_length.  decryption error.")
+
+        # step 2a of the encoding, step 3a of the decoding
+        if (None != L):
+            self.lHash = self.mgf.hash(L).digest()
+        else:
+            self.lHash = self.mgf.lHash
+
+        self.maxmLen = self.k - 2*self.hLen - 2
+
+    def encode(self, M):
+        (k, hLen, mgf) = (self.k, self.hLen, self.mgf)
+        mLen = len(M)
+
+        # step 1b
+        if (self.maxmLen < mLen):
+            raise ValueError("Message argument M must be less than (modulus_length - 2*hash_digest_length - 2) bytes.  message too long.")
+
+        #
+        # 2. EME-OAEP encoding (see Figure 1 in section 7.1.1 of PKCS#1 v 2.2):
+        # EM is built in place as 0x00 || seed || DB and then masked.
+        #
+
+        # steps 2b and 2c: DB = lHash || PS || 0x01 || M, PS is all zero
+        EM = bytearray(k)
+        EM[hLen+1:2*hLen+1] = self.lHash
+        EM[k-mLen-1] = 0x01
+        EM[k-mLen:] = M
+
+        # step 2d
+        seed = random_bytes(hLen)
+        EM[1:hLen+1] = seed
+
+        # steps 2e and 2f: maskedDB = DB xor MGF(seed, k - hLen - 1)
+        mgf.mask_into(EM, seed, hLen+1, k)
+
+        # steps 2g and 2h: maskedSeed = seed xor MGF(maskedDB, hLen)
+        mgf.mask_into(EM, bytes(EM[hLen+1:]), 1, hLen+1)
+
+        # step 2i
+        return bytes(EM)
+
+    # See RSAES_OAEP_EME_Decode for fail_fast and metrics.  M is only
+    # meaningful if padding_correct: for incorrect padding the full decode
+    # returns whatever follows the first nonzero byte after lHash, while
+    # fail_fast returns b'' if it stops at Y or lHash.
+    def decode(self, EM, fail_fast=False, metrics=None):
+        (k, hLen, mgf, lHash) = (self.k, self.hLen, self.mgf, self.lHash)
+
+        # step 1b
+        if (k != len(EM)):
+            raise ValueError("Encoded Message argument EM must have length equal to byte length of modulus n.  decryption error.")
+
+        #
+        # 3. EME-OAEP decoding:
+        # EM = Y || maskedSeed || maskedDB is unmasked in place in a copy.
+        #
+
+        # step 3b
+        Y = EM[0]
+
+        if (fail_fast and (0x00 != Y)):
+            if (None != metrics):
+                metrics.count("rejected: bad Y")
+            return (b'', False)
+
+        buf = bytearray(EM)
+
+        # steps 3c and 3d: seed = maskedSeed xor MGF(maskedDB, hLen)
+        mgf.mask_into(buf, bytes(EM[hLen+1:]), 1, hLen+1)
+        seed = bytes(buf[1:hLen+1])
+
+        if (fail_fast):
+            # The first hLen bytes of dbMask are the first hash block, so the
+            # lHash check only needs one block of MGF1 output.
+            mgf.mask_into(buf, seed, hLen+1, 2*hLen+1)
+            if (buf[hLen+1:2*hLen+1] != lHash):
+                if (None != metrics):
+                    metrics.count("rejected: lHash mismatch")
+                return (b'', False)
+            # steps 3e and 3f for the rest of DB, from the second hash block
+            mgf.mask_into(buf, seed, 2*hLen+1, k, 1)
+        else:
+            # steps 3e and 3f: DB = maskedDB xor MGF(seed, k - hLen - 1)
+            mgf.mask_into(buf, seed, hLen+1, k)
 
-    for counter in range((maskLen+hLen)//hLen):
-        C = counter.to_bytes(4, 'big')
-        h2 = h.copy()
-        h2.update(C)
-        T.extend(h2.digest())
+        DB = bytes(buf[hLen+1:])
 
-    return bytes(T[0:maskLen])
-    
+        # step 3g
+        # parse DB = lHash_decoded || PS || 0x01 || M
 
-def RSAES_OAEP_EME_Encode(n, e, M, L, hashfn):
+        lHash_decoded = DB[0:hLen]
 
-    if ((int != type(n)) or (int != type(e))):
-        raise TypeError("Public key arguments n and e must be type int.")
-    if (bytes != type(M)):
-        raise TypeError("Message argument M must be type class bytes.")
-    if ((None != L) and (bytes != type(L))):
-        raise TypeError("Optional Label argument L must be None or type class bytes.")
-    if (str != type(hashfn)):
-        raise TypeError("Hash function argument hashfn must be type str.")
-    if (hashfn not in allowed_hashes):
-        raise ValueError("Hash function argument hashfn must be a gauranteed algorithm in hashlib.")
+        i = len(DB) - len(DB[hLen:].lstrip(b'\x00'))
 
-    #
-    # 1. Length checking:
-    #
+        S = None
+        if (i < len(DB)):
+            S = DB[i]
 
-    # get lengths of parameters
-    k = (n.bit_length() + 7)//8
-    mLen = len(M)
-
-    h = hashlib.new(hashfn)
-    hLen = h.digest_size
+        M = DB[i+1:]
 
-    # step 1a
-    if ((None != L) and ((2**61 - 1) < len(L))):
-        raise ValueError("Optional Label argument L must be at most 2**61 - 1 bytes long.  label too long.")
+        mLen = len(M)
 
-    # step 1b
-    if ((k - 2*hLen - 2) < mLen):
-        raise ValueError("Message argument M must be less than (modulus_length - 2*hash_digest_length - 2) bytes.  message too long.")
+        padding_correct = True
 
-    #
-    # 2. EME-OAEP encoding (see Figure 1 in section 7.1.1 of PKCS#1 v 2.2):
-    #
+        padding_correct = (0x00 == Y) and padding_correct
+        padding_correct = (0x01 == S) and padding_correct
+        padding_correct = (lHash_decoded == lHash) and padding_correct
+        padding_correct = ((i-hLen) == (k - mLen - 2*hLen - 2)) and padding_correct
 
-    # step 2a
-    if (None != L):
-        h.update(L)
-        
-    lHash = h.digest()
+        if ((None != metrics) and (not padding_correct)):
+            if (0x00 != Y):
+                metrics.count("rejected: bad Y")
+            elif (lHash_decoded != lHash):
+                metrics.count("rejected: lHash mismatch")
+            else:
+                metrics.count("rejected: missing separator")
 
-    # step 2b    
-    lPS = k - mLen - 2*hLen - 2
-    PS = bytes(lPS)
+        return (M, padding_correct)
 
-    # step 2c
-    DB = lHash + PS + b'\x01' + M
+    # Encodes each message in Ms, yielding the encoded messages in order.
+    def encode_many(self, Ms):
+        encode = self.encode
+        for M in Ms:
+            yield encode(M)
 
-    # step 2d
-    seedi = secrets.randbits(8*hLen)
-    seed = seedi.to_bytes(hLen, 'big')
+    # Decodes each encoded message in EMs, yielding (M, padding_correct)
+    # pairs in order.
+    def decode_many(self, EMs, fail_fast=False, metrics=None):
+        decode = self.decode
+        for EM in EMs:
+            yield decode(EM, fail_fast, metrics)
 
-    # step 2e
-    lDB = k - hLen - 1
-    dbMask = RSAES_PKCS1_v22_OAEP_MGF1(seed, lDB, hashfn)
 
-    # step 2f
-    DBi = int.from_bytes(DB, 'big')
-    dbMaski = int.from_bytes(dbMask, 'big')
-    maskedDBi = DBi^dbMaski
-    maskedDB = maskedDBi.to_bytes(lDB, 'big')
+def RSAES_OAEP_EME_Encode(n, e, M, L, hashfn):
 
-    # step 2g
-    seedMask = RSAES_PKCS1_v22_OAEP_MGF1(maskedDB, hLen, hashfn)
+    if ((int != type(n)) or (int != type(e))):
+        raise TypeError("Public key arguments n and e must be type int.")
+    if (bytes != type(M)):
+        raise TypeError("Message argument M must be type class bytes.")
+    if ((None != L) and (bytes != type(L))):
+        raise TypeError("Optional Label argument L must be None or type class bytes.")
+    if (str != type(hashfn)):
+        raise TypeError("Hash function argument hashfn must be type str.")
+    if (hashfn not in allowed_hashes):
+        raise ValueError("Hash function argument hashfn must be a gauranteed algorithm in hashlib.")
 
-    # step 2h
-    seedMaski = int.from_bytes(seedMask, 'big')
-    maskedSeedi = seedi ^ seedMaski
-    maskedSeed = maskedSeedi.to_bytes(hLen, 'big')
+    return OAEPCodec(n, hashfn, L).encode(M)
 
-    # step 2i
-    EM = b'\x00' + maskedSeed + maskedDB
 
-    return EM
+# Range [lo, hi) of the integers whose k byte encoding starts with Y = 0x00.
+# Used to reject candidates before converting them to bytes.
+def RSAES_OAEP_EM_range(k):
+    return (0, 2**(8*(k-1)))
 
 
-def RSAES_OAEP_EME_Decode(n, EM, L, hashfn):
+# With fail_fast set, the decode stops as soon as Y != 0 or the unmasked
+# lHash does not match, and returns (b'', False) without expanding the rest
+# of dbMask.  padding_correct is the same in both modes, and so is M whenever
+# the padding is correct.  For incorrect padding M differs between the modes
+# and must not be used: the full decode still returns the bytes after the
+# first nonzero byte following lHash, which is what it always returned.
+# If a SearchMetrics object is passed as metrics, the reason for incorrect
+# padding is counted in it.
+def RSAES_OAEP_EME_Decode(n, EM, L, hashfn, fail_fast=False, metrics=None):
     
     if (int != type(n)):
         raise TypeError("Public key arguments n and e must be type int.")
@@ -210,89 +411,4 @@ def RSAES_OAEP_EME_Decode(n, EM, L, hashfn):
     if (hashfn not in allowed_hashes):
         raise ValueError("Hash function argument hashfn must be a gauranteed algorithm in hashlib.")
 
-    #
-    # 1. Length checking:
-    #
-
-    # get lengths of parameters
-    k = (n.bit_length() + 7)//8
-    EMlen = len(EM)
-
-    h = hashlib.new(hashfn)
-    hLen = h.digest_size
-
-    # step 1a
-    if ((None != L) and ((2**61 - 1) < len(L))):
-        raise ValueError("Optional Label argument L must be at most 2**61 - 1 bytes long.  label too long.")
-
-    # step 1b
-    if (k != EMlen):
-        raise ValueError("Encoded Message argument EM must have length equal to byte length of modulus n.  decryption error.")
-
-    # step 1c
-    if (k < (2*hLen + 2)):
-        raise ValueError("modulus_length must be >= 2*hash_digest_length.  decryption error.")
-
-    #
-    # 2. RSA decryption:
-    # This step is skipped and the output is assumed to be passed to this function.
-
-    #
-    # 3. EME-OAEP decoding:
-    #
-
-    # step 3a
-    if (None != L):
-        h.update(L)
-
-    lHash = h.digest()
-
-    # step 3b
-    # parse EM = Y || masked_seed || maskedDB
-    Y = EM[0]
-    maskedSeed = EM[1:hLen+1]
-    maskedDB = EM[hLen+1:]
-    maskedDBi = int.from_bytes(maskedDB, 'big')
-
-    # step 3c
-    seedMask = RSAES_PKCS1_v22_OAEP_MGF1(maskedDB, hLen, hashfn)
-
-    # step 3d
-    seedMaski = int.from_bytes(seedMask, 'big')
-    maskedSeedi = int.from_bytes(maskedSeed, 'big')
-    seedi = seedMaski ^ maskedSeedi
-    seed = seedi.to_bytes(hLen, 'big')
-
-    # step 3e
-    dbMask = RSAES_PKCS1_v22_OAEP_MGF1(seed, k-hLen-1, hashfn)
-
-    # step 3f
-    maskedDBi = int.from_bytes(maskedDB, 'big')
-    dbMaski = int.from_bytes(dbMask, 'big')
-    DBi = maskedDBi ^ dbMaski
-    DB = DBi.to_bytes(k-hLen-1, 'big')
-
-    # step 3g
-    # parse DB = lHash_decoded || PS || 0x01 || M
-
-    lHash_decoded = DB[0:hLen]
-
-    i = hLen
-    while (0x00 == DB[i]) :
-        i = i + 1
-
-    S = DB[i]
-
-    M = DB[i+1:]
-
-    mLen = len(M)
-
-    padding_correct = True
-
-    padding_correct = (0x00 == Y) and padding_correct
-    padding_correct = (0x01 == S) and padding_correct
-    padding_correct = (lHash_decoded == lHash) and padding_correct
-    padding_correct = ((i-hLen) == (k - mLen - 2*hLen - 2)) and padding_correct
-
-    return (M, padding_correct)
-
+    return OAEPCodec(n, hashfn, L).decode(EM, fail_fast, metrics)
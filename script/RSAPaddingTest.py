@@ -33,6 +33,81 @@ def Test_OAEP(n, e, M, L):
             print("M' = " + hex(int.from_bytes(M_decoded, 'big')))
         print("padding checked out " + str(padding_correct) + " Decoded message length: " + str(len(M_decoded))) 
 
+def Test_OAEP_Fail_Fast(n, e, M, L):
+    k = (n.bit_length() + 7)//8
+    for hashfn in allowed_hashes:
+        EM = RSAES_OAEP_EME_Encode(n, e, M, L, hashfn)
+        # the valid encoding, then a bad Y, a bad lHash and a bad separator
+        hLen = hashlib.new(hashfn).digest_size
+        EMs = [EM, b'\x01' + EM[1:], EM[:hLen+1] + bytes([EM[hLen+1] ^ 1]) + EM[hLen+2:],
+               EM[:k-len(M)-1] + bytes([EM[k-len(M)-1] ^ 0x80]) + EM[k-len(M):]]
+        for EMx in EMs:
+            (M_full, pc_full) = RSAES_OAEP_EME_Decode(n, EMx, L, hashfn)
+            (M_fast, pc_fast) = RSAES_OAEP_EME_Decode(n, EMx, L, hashfn, fail_fast=True)
+            if ((pc_full != pc_fast) or (pc_full and (M_full != M_fast))):
+                print("OAEP fail fast decode FAILED for " + hashfn)
+                return False
+        # Rejected at Y or lHash, fail fast returns no message.
+        for EMx in EMs[1:3]:
+            if ((b'', False) != RSAES_OAEP_EME_Decode(n, EMx, L, hashfn, fail_fast=True)):
+                print("OAEP fail fast decode rejection FAILED for " + hashfn)
+                return False
+    print("OAEP fail fast decode PASSED.")
+    return True
+
+def Test_OAEP_Codec(n, e, messages, L):
+    for hashfn in allowed_hashes:
+        codec = OAEPCodec(n, hashfn, L)
+        EMs = list(codec.encode_many(messages))
+        decoded = list(codec.decode_many(EMs))
+        if ((decoded != [(M, True) for M in messages]) or
+            ([RSAES_OAEP_EME_Decode(n, EM, L, hashfn) for EM in EMs] != decoded)):
+            print("OAEP codec FAILED for " + hashfn)
+            return False
+    print("OAEP codec PASSED.")
+    return True
+
+def Test_Random_Pool():
+    PS = random_nonzero_bytes(3*RandomPool.refill_size)
+    if ((3*RandomPool.refill_size != len(PS)) or (0 in PS) or (17 != len(random_bytes(17)))):
+        print("Random pool lengths FAILED.")
+        return False
+
+    # a forked child must not repeat the parent's pooled bytes
+    random_bytes(1)
+    if (hasattr(os, "fork")):
+        (r, w) = os.pipe()
+        pid = os.fork()
+        if (0 == pid):
+            os.write(w, random_bytes(32))
+            os._exit(0)
+        os.waitpid(pid, 0)
+        child = os.read(r, 32)
+        os.close(r)
+        os.close(w)
+        if (child == random_bytes(32)):
+            print("Random pool fork FAILED.")
+            return False
+
+    print("Random pool PASSED.")
+    return True
+
+def Test_MGF1_Mask_Into(seed):
+    for hashfn in allowed_hashes:
+        mgf = get_mgf1(hashfn)
+        for maskLen in [0, 1, mgf.hLen, 3*mgf.hLen + 1]:
+            mask = RSAES_PKCS1_v22_OAEP_MGF1(seed, maskLen, hashfn)
+            # the mask XORed into the middle of a buffer, and from block 1
+            buf = bytearray(b'\xff'*(maskLen + 2))
+            mgf.mask_into(buf, seed, 1, maskLen + 1)
+            tail = mgf.mask(seed, max(0, maskLen - mgf.hLen), 1)
+            if ((bytes(x ^ 0xff for x in mask) != buf[1:maskLen+1]) or (b'\xff' != buf[0:1]) or
+                (b'\xff' != buf[-1:]) or (mask[mgf.hLen:] != tail)):
+                print("MGF1 mask_into FAILED for " + hashfn)
+                return False
+    print("MGF1 mask_into PASSED.")
+    return True
+
 testhash160 = 0x0123456789012345678901234567890123456789
 testhash256 = 0x0123456789012345678901234567890123456789012345678901234567890123
 testhash384 = 0x012345678901234567890123456789012345678901234567890123456789012345678901234567890123
@@ -88,3 +163,13 @@ messages = [M1, M2, M3, M4, M5, M6, M7, M8, M9]
               
 for M in messages:
     Test_OAEP(n2048, e, M, None)
+
+for M in messages:
+    Test_OAEP_Fail_Fast(n2048, e, M, None)
+
+Test_MGF1_Mask_Into(nonceb)
+
+Test_OAEP_Codec(n2048, e, messages, None)
+Test_OAEP_Codec(n2048, e, messages, b'label')
+
+Test_Random_Pool()
@@ -0,0 +1,139 @@
+#
+# RSAParallelPlaintextSearch.py - Multi-process plaintext search, with the
+#                                 candidate range split into chunks
+#
+# Copyright (c) Microsoft Corporation. Licensed under the MIT license.
+#
+
+from RSAMath import *
+from RSAKeyContext import *
+from RSAOAEPPlaintextSearch import *
+from RSAPKCS1PlaintextSearch import *
+from concurrent.futures import ProcessPoolExecutor
+import os
+
+default_chunk_size = 4096
+
+# Worker side: scans candidate indices [start, stop) for one ciphertext.
+# Each chunk starts at g_e_torsion^start with one exponentiation, see
+# rsa_bad_key_scan, so chunks are independent.  Returns the (index, pt_dict)
+# pairs for the valid candidates and the chunk's SearchMetrics as a dict.
+def parallel_scan_chunk(args):
+    (scheme, key, zp, xq, start, stop, param) = args
+    metrics = SearchMetrics()
+    N = key["N"]
+    bytelen = key["bytelen"]
+
+    if ("pkcs1" == scheme):
+        (lo, hi) = RSAES_PKCS1_v15_EM_range(bytelen)
+    elif ("oaep" == scheme):
+        (lo, hi) = RSAES_OAEP_EM_range(bytelen)
+    else:
+        (lo, hi) = (param, param+1)
+
+    codec = None
+    if ("oaep" == scheme):
+        codec = OAEPCodec(N, param)
+
+    found = []
+    survivors = 0
+    with metrics.phase("candidate scan"):
+        for (i, pt_hat) in rsa_bad_key_scan(key, zp, xq, lo, hi, start, stop):
+            survivors = survivors + 1
+            if ("pkcs1" == scheme):
+                pt_dict = RSAPKCS1_check_candidate(pt_hat, bytelen, metrics)
+            elif ("oaep" == scheme):
+                pt_dict = RSAOAEP_check_candidate(pt_hat, N, bytelen, param, metrics, codec)
+            else:
+                pt_dict = {"plaintext":pt_hat}
+            if (None != pt_dict):
+                found.append((i, pt_dict))
+
+    metrics.count("candidates", stop - start)
+    metrics.count("survivors", survivors)
+    if ("pkcs1" == scheme):
+        metrics.count("rejected: bad prefix", stop - start - survivors)
+    elif ("oaep" == scheme):
+        metrics.count("rejected: bad Y", stop - start - survivors)
+    metrics.count("plaintexts", len(found))
+    return (found, metrics.to_dict())
+
+# Splits the candidate indices 0..r-1 into chunks of chunk_size candidates and scans them on a
+# process pool.  Results are merged in candidate index order, so the output
+# is the same as the sequential search.  An existing executor can be passed
+# in to amortize the pool start up over many searches.  The "candidate scan"
+# phase in metrics is the sum over the workers, "parallel scan" is the wall
+# clock time.
+def parallel_candidate_search(ctx, ct, scheme, param=None, workers=None,
+                              chunk_size=default_chunk_size, executor=None, metrics=None):
+    if (None == metrics):
+        metrics = SearchMetrics()
+
+    key = ctx.key
+    r = key["r"]
+    with metrics.phase("private key ops"):
+        (zp, xq) = rsa_bad_key_residues(key, ct)
+
+    chunks = [(scheme, key, zp, xq, start, min(start + chunk_size, r), param)
+              for start in range(0, r, chunk_size)]
+
+    with metrics.phase("parallel scan"):
+        if (None == executor):
+            if (None == workers):
+                workers = os.cpu_count()
+            with ProcessPoolExecutor(max_workers=workers) as pool:
+                results = list(pool.map(parallel_scan_chunk, chunks))
+        else:
+            results = list(executor.map(parallel_scan_chunk, chunks))
+
+    for (found, chunk_metrics) in results:
+        metrics.merge(chunk_metrics)
+
+    return [pt_dict for (found, _) in results for (i, pt_dict) in found]
+
+def RSAPKCS1_plaintext_search_parallel(p, q, e, ct, workers=None,
+                                       chunk_size=default_chunk_size, executor=None,
+                                       metrics=None):
+    if (None == metrics):
+        metrics = SearchMetrics()
+
+    ctx = get_key_context(p, q, e, metrics)
+    if (None == ctx):
+        return None
+
+    pt_list = parallel_candidate_search(ctx, ct, "pkcs1", None, workers, chunk_size, executor, metrics)
+
+    return pt_list
+
+def RSAOAEP_plaintext_search_parallel(p, q, e, ct, hashfn, workers=None,
+                                      chunk_size=default_chunk_size, executor=None,
+                                      metrics=None):
+    if (str != type(hashfn)):
+        raise TypeError("Hash function argument hashfn must be type str.")
+
+    if (None == metrics):
+        metrics = SearchMetrics()
+
+    ctx = get_key_context(p, q, e, metrics)
+    if (None == ctx):
+        return None
+
+    pt_list = parallel_candidate_search(ctx, ct, "oaep", hashfn, workers, chunk_size, executor, metrics)
+
+    return pt_list
+
+def fix_bad_rsa_encryption_parallel(p, q, e, ct, pt, workers=None,
+                                    chunk_size=default_chunk_size, executor=None,
+                                    metrics=None):
+    if (None == metrics):
+        metrics = SearchMetrics()
+
+    ctx = get_key_context(p, q, e, metrics)
+    if (None == ctx):
+        return None
+
+    pt_list = parallel_candidate_search(ctx, ct, "exact", pt, workers, chunk_size, executor, metrics)
+
+    if (0 == len(pt_list)):
+        return None
+    return pt_list[0]["plaintext"]
@@ -0,0 +1,42 @@
+#
+# RSAParallelPlaintextSearchTest.py - Test for the multi-process plaintext search
+#
+# Copyright (c) Microsoft Corporation. Licensed under the MIT license.
+#
+
+from RSAParallelPlaintextSearch import *
+
+import RSATestCases
+
+def test_parallel_plaintext_search(p, q, N, e, pt, hashfn, executor):
+    ctx = get_key_context(p, q, e)
+
+    ct = int.from_bytes(RSAEncrypt_PKCS1(pt, N, e), 'big')
+    pt_list = RSAPKCS1_plaintext_search_parallel(p, q, e, ct, chunk_size=5000, executor=executor)
+    if (pt_list != RSAPKCS1_plaintext_search_key(ctx, ct)):
+        print("PKCS1 parallel search FAILED.")
+        return False
+
+    ct = int.from_bytes(RSAEncrypt_OAEP(pt, N, e, hashfn), 'big')
+    pt_list = RSAOAEP_plaintext_search_parallel(p, q, e, ct, hashfn, chunk_size=5000, executor=executor)
+    if (pt_list != RSAOAEP_plaintext_search_key(ctx, ct, hashfn)):
+        print("OAEP parallel search FAILED.")
+        return False
+
+    pti = random.randint(1, N-1)
+    ct = pow(pti, e, N)
+    if (pti != fix_bad_rsa_encryption_parallel(p, q, e, ct, pti, chunk_size=5000, executor=executor)):
+        print("Parallel fix bad rsa encryption FAILED.")
+        return False
+
+    print("PASSED.")
+    return True
+
+if __name__ == "__main__":
+    pt = RSATestCases.pt
+
+    with ProcessPoolExecutor(max_workers=2) as executor:
+        for bad_prvk in RSATestCases.bad_priv_keys[:2]:
+            print("RSA parallel plaintext search " + str(bad_prvk["bitlength"]) + "bit test case:\n")
+            test_parallel_plaintext_search(bad_prvk["p"], bad_prvk["q"], bad_prvk["N"], bad_prvk["e"], pt, "sha256", executor)
+            print("\n\n")
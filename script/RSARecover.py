@@ -0,0 +1,193 @@
+#
+# RSARecover.py - Command line tool for bulk plaintext recovery under
+#                 incorrectly generated keys
+#
+# Copyright (c) Microsoft Corporation. Licensed under the MIT license.
+#
+# Usage:
+#   python RSARecover.py jobs.jsonl [-o results.jsonl] [--workers N]
+#                        [--batch-size N] [--first]
+#
+# The job file has one JSON object per line:
+#   {"id": "...", "p": ..., "q": ..., "e": 65537, "ct": "<hex>",
+#    "scheme": "pkcs1" | "oaep", "hash": "sha256"}
+# p, q and e are ints or decimal/0x-hex strings, ct is the ciphertext as a hex
+# string of bytes (or an int).  "hash" is only used for OAEP and defaults to
+# sha1, "scheme" defaults to pkcs1 and "id" to the line number.
+#
+# Jobs are grouped by key and handed to the worker processes in batches, so
+# every worker sets up each key once (see RSAKeyContext).  One JSON line is
+# written per recovered plaintext:
+#   {"id": ..., "index": ..., "plaintext": "<hex>", "scheme": ..., ...}
+# Errors and the final throughput summary go to stderr.
+#
+# --first stops at the first candidate whose padding is valid.  That is
+# reliable for OAEP, but a PKCS1 v1.5 padding check passes for about one
+# candidate in 2^16 by chance, so for PKCS1 jobs on keys with many
+# candidates the first plaintext may be a false positive.  A warning is
+# written to stderr when --first meets PKCS1 jobs.
+#
+
+from RSAOAEPPlaintextSearch import *
+from RSAPKCS1PlaintextSearch import *
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+import argparse
+import contextlib
+import json
+import os
+import sys
+
+def parse_int(value):
+    if (int == type(value)):
+        return value
+    return int(value, 0)
+
+def parse_ciphertext(value):
+    if (int == type(value)):
+        return value
+    return int.from_bytes(bytes.fromhex(value), 'big')
+
+# Yields the jobs of the job file f.  A line that is not a JSON object
+# yields {"id": lineno, "error": ...} instead, so one malformed line does
+# not end the run.
+def read_jobs(f):
+    for (lineno, line) in enumerate(f, 1):
+        line = line.strip()
+        if (0 == len(line)):
+            continue
+        try:
+            job = json.loads(line)
+            if (dict != type(job)):
+                raise ValueError("Job must be a JSON object.")
+        except ValueError as err:
+            yield {"id":lineno, "error":"malformed job: " + str(err)}
+            continue
+        job.setdefault("id", lineno)
+        job.setdefault("scheme", "pkcs1")
+        yield job
+
+# Groups jobs by key, preserving the order of first appearance.  Returns
+# (groups, errors), errors being the error records of the jobs that were
+# malformed or whose key does not parse.
+def group_jobs_by_key(jobs):
+    groups = {}
+    errors = []
+    for job in jobs:
+        if ("error" in job):
+            errors.append(job)
+            continue
+        try:
+            key = (parse_int(job["p"]), parse_int(job["q"]), parse_int(job["e"]))
+        except (ValueError, TypeError, KeyError) as err:
+            errors.append({"id":job["id"], "error":"malformed key: " + str(err)})
+            continue
+        groups.setdefault(key, []).append(job)
+    return (groups, errors)
+
+# Worker side: recovers the plaintexts of a batch of jobs under one key and
+# returns (records, errors, number of ciphertexts).
+def recover_batch(p, q, e, jobs, max_results):
+    records = []
+    errors = []
+    # Keep stray prints of the library off the JSON output.
+    with contextlib.redirect_stdout(sys.stderr):
+        ctx = get_key_context(p, q, e)
+        if (None == ctx):
+            errors = [{"id":job["id"], "error":"unsupported key"} for job in jobs]
+            return (records, errors, len(jobs))
+
+        for job in jobs:
+            try:
+                ct = parse_ciphertext(job["ct"])
+                if ("pkcs1" == job["scheme"]):
+                    results = RSAPKCS1_plaintext_search_key_iter(ctx, ct, max_results)
+                elif ("oaep" == job["scheme"]):
+                    results = RSAOAEP_plaintext_search_key_iter(ctx, ct, job.get("hash", "sha1"),
+                                                               max_results)
+                else:
+                    raise ValueError("Unknown padding scheme " + str(job["scheme"]) + ".")
+                for result in results:
+                    record = {"id":job["id"], "index":result.index,
+                              "plaintext":result.plaintext.hex(), "scheme":job["scheme"]}
+                    if ("oaep" == job["scheme"]):
+                        record["hash"] = job.get("hash", "sha1")
+                    else:
+                        record["paddinglength"] = result.paddinglength
+                    records.append(record)
+            except (ValueError, TypeError, KeyError) as err:
+                errors.append({"id":job["id"], "error":str(err)})
+
+    return (records, errors, len(jobs))
+
+def main(argv):
+    parser = argparse.ArgumentParser(description="Recover plaintexts encrypted under incorrectly generated RSA keys.")
+    parser.add_argument("jobs", help="JSON lines job file, - for stdin")
+    parser.add_argument("-o", "--output", help="JSON lines output file (default: stdout)")
+    parser.add_argument("--workers", type=int, default=os.cpu_count(), help="worker processes")
+    parser.add_argument("--batch-size", type=int, default=64, help="ciphertexts per work item")
+    parser.add_argument("--first", action="store_true", help="stop at the first valid plaintext per ciphertext (unreliable for pkcs1)")
+    args = parser.parse_args(argv)
+
+    if ("-" == args.jobs):
+        (groups, job_errors) = group_jobs_by_key(read_jobs(sys.stdin))
+    else:
+        with open(args.jobs, "r") as f:
+            (groups, job_errors) = group_jobs_by_key(read_jobs(f))
+
+    max_results = None
+    if (args.first):
+        max_results = 1
+        if (any([("pkcs1" == job["scheme"]) for jobs in groups.values() for job in jobs])):
+            sys.stderr.write("WARNING: --first may return a false positive for pkcs1 jobs.\n")
+
+    batches = [(key, jobs[i:i+args.batch_size])
+               for (key, jobs) in groups.items()
+               for i in range(0, len(jobs), args.batch_size)]
+
+    out = sys.stdout
+    if (None != args.output):
+        out = open(args.output, "w")
+
+    for error in job_errors:
+        sys.stderr.write(json.dumps(error) + "\n")
+
+    (nciphertexts, nplaintexts, nerrors) = (len(job_errors), 0, len(job_errors))
+    with Timer() as t:
+        with ProcessPoolExecutor(max_workers=args.workers) as pool:
+            # Keep a bounded number of batches in flight, results are
+            # written as soon as a batch completes.
+            pending = set()
+            batch_iter = iter(batches)
+            while True:
+                for ((p, q, e), jobs) in batch_iter:
+                    pending.add(pool.submit(recover_batch, p, q, e, jobs, max_results))
+                    if (len(pending) >= 2*args.workers):
+                        break
+                if (0 == len(pending)):
+                    break
+                (done, pending) = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    (records, errors, n) = future.result()
+                    for record in records:
+                        out.write(json.dumps(record) + "\n")
+                    out.flush()
+                    for error in errors:
+                        sys.stderr.write(json.dumps(error) + "\n")
+                    nciphertexts = nciphertexts + n
+                    nplaintexts = nplaintexts + len(records)
+                    nerrors = nerrors + len(errors)
+
+    if (None != args.output):
+        out.close()
+
+    rate = 0.0
+    if (0 < t.interval):
+        rate = nciphertexts/t.interval
+    sys.stderr.write(json.dumps({"keys":len(groups), "ciphertexts":nciphertexts, "plaintexts":nplaintexts,
+                                 "errors":nerrors, "seconds":t.interval, "ciphertexts_per_second":rate}) + "\n")
+    if (0 != nerrors):
+        return 1
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
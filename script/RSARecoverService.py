@@ -0,0 +1,254 @@
+#
+# RSARecoverService.py - Local plaintext recovery and decryption service
+#
+# Copyright (c) Microsoft Corporation. Licensed under the MIT license.
+#
+# Usage:
+#   python RSARecoverService.py --socket /tmp/rsarecover.sock [--workers N]
+#   python RSARecoverService.py --port 8765 [--workers N]
+#
+# Clients connect to the Unix socket (or to the TCP port on 127.0.0.1) and
+# send one JSON request per line.  Responses are JSON lines tagged with the
+# request id, in completion order, so a client can pipeline many requests.
+#
+#   {"id": 1, "tenant": "a", "op": "recover", "p": ..., "q": ..., "e": 65537,
+#    "ct": "<hex>", "scheme": "pkcs1" | "oaep", "hash": "sha256",
+#    "max_results": 1}
+#   {"id": 2, "tenant": "a", "op": "decrypt", "p": ..., "q": ..., "d": ...,
+#    "ct": "<hex>", "scheme": "pkcs1" | "oaep", "hash": "sha256"}
+#   {"id": 3, "op": "stats"}
+#
+# Jobs are queued per tenant and dispatched round robin across tenants, at
+# most one job per worker at a time.  Every worker is a single process
+# executor and jobs on the same key go to the same worker while it is free,
+# so the key context (see RSAKeyContext) stays warm in that process and a
+# ciphertext on a known key only costs its scan.  A job whose worker is busy
+# runs on another free worker rather than leave it idle.
+#
+
+from RSARecover import *
+from RSAOAEP import *
+from RSAPKCS1 import *
+from collections import OrderedDict, deque
+from concurrent.futures import ProcessPoolExecutor
+import asyncio
+import functools
+import multiprocessing
+
+# Worker side: one recovery job, see recover_batch.
+def service_recover_job(job):
+    (p, q, e) = (parse_int(job["p"]), parse_int(job["q"]), parse_int(job["e"]))
+    with Timer() as t:
+        (records, errors, _) = recover_batch(p, q, e, [job], job.get("max_results"))
+    if (0 != len(errors)):
+        return {"error":errors[0]["error"]}
+    for record in records:
+        del record["id"]
+    return {"results":records, "seconds":t.interval}
+
+@functools.lru_cache(maxsize=64)
+def service_private_key(p, q, d):
+    return RSAPrivateKeyCRT(p, q, d)
+
+# Worker side: one decryption job with a cached RSAPrivateKeyCRT.
+def service_decrypt_job(job):
+    try:
+        key = service_private_key(parse_int(job["p"]), parse_int(job["q"]), parse_int(job["d"]))
+        ct = bytes.fromhex(job["ct"])
+        with Timer() as t:
+            if ("oaep" == job.get("scheme", "pkcs1")):
+                pt = RSADecrypt_OAEP_key(ct, key, job.get("hash", "sha1"))
+            else:
+                pt = RSADecrypt_PKCS1_key(ct, key)
+    except (ValueError, TypeError, KeyError) as err:
+        return {"error":str(err)}
+    return {"plaintext":pt.hex(), "seconds":t.interval}
+
+class RecoveryService:
+    def __init__(self, workers=None):
+        if (None == workers):
+            workers = os.cpu_count()
+        # Spawned, not forked: a forked worker would inherit the client
+        # sockets open at the time and keep them from closing.
+        context = multiprocessing.get_context("spawn")
+        self.executors = [ProcessPoolExecutor(max_workers=1, mp_context=context) for _ in range(workers)]
+        # tenant -> deque of (job, future), in round robin order
+        self.queues = OrderedDict()
+        # One slot per worker, and a count of the free workers.
+        self.worker_slots = [asyncio.Semaphore(1) for _ in range(workers)]
+        self.slots = asyncio.Semaphore(workers)
+        self.ready = asyncio.Event()
+        # the concurrent futures of the jobs handed to the executors
+        self.pending = set()
+        self.running = 0
+        self.completed = 0
+
+    # Cancels the queued jobs and the executor jobs that have not started,
+    # and waits for the running ones.
+    def shutdown(self):
+        for queue in self.queues.values():
+            for (_, future) in queue:
+                future.cancel()
+        self.queues.clear()
+        for future in list(self.pending):
+            future.cancel()
+        for executor in self.executors:
+            executor.shutdown(wait=True)
+
+    # The worker a job runs on, called with at least one worker free.  A key
+    # is pinned to one worker, so its key context stays warm there, but only
+    # while that worker is free: otherwise the job goes to the next free
+    # worker instead of waiting behind the others on the same key.
+    def worker_for(self, job):
+        (p, q) = (parse_int(job["p"]), parse_int(job["q"]))
+        pinned = hash((min(p, q), max(p, q))) % len(self.executors)
+        for i in range(len(self.executors)):
+            worker = (pinned + i) % len(self.executors)
+            if (not self.worker_slots[worker].locked()):
+                return worker
+        raise RuntimeError("No free worker.")
+
+    # Queues a job for its tenant and waits for the response dict.
+    async def submit(self, job):
+        future = asyncio.get_running_loop().create_future()
+        tenant = job.get("tenant", "")
+        if (tenant not in self.queues):
+            self.queues[tenant] = deque()
+        self.queues[tenant].append((job, future))
+        self.ready.set()
+        return await future
+
+    def next_job(self):
+        (tenant, queue) = next(iter(self.queues.items()))
+        item = queue.popleft()
+        if (0 == len(queue)):
+            del self.queues[tenant]
+        else:
+            self.queues.move_to_end(tenant)
+        return item
+
+    async def dispatch(self):
+        while True:
+            await self.slots.acquire()
+            while (0 == len(self.queues)):
+                self.ready.clear()
+                await self.ready.wait()
+            (job, future) = self.next_job()
+            try:
+                worker = self.worker_for(job)
+            except (ValueError, TypeError, KeyError) as err:
+                self.slots.release()
+                future.set_result({"error":str(err)})
+                continue
+            # Free, so this does not block.
+            await self.worker_slots[worker].acquire()
+            asyncio.create_task(self.run(job, future, worker))
+
+    async def run(self, job, future, worker):
+        self.running = self.running + 1
+        try:
+            if ("decrypt" == job.get("op")):
+                fn = service_decrypt_job
+            else:
+                fn = service_recover_job
+            try:
+                executor_future = self.executors[worker].submit(fn, job)
+                self.pending.add(executor_future)
+                executor_future.add_done_callback(self.pending.discard)
+                response = await asyncio.wrap_future(executor_future)
+            except Exception as err:
+                response = {"error":repr(err)}
+            if (not future.done()):
+                future.set_result(response)
+        finally:
+            self.running = self.running - 1
+            self.completed = self.completed + 1
+            self.worker_slots[worker].release()
+            self.slots.release()
+
+    def stats(self):
+        return {"queued":sum([len(queue) for queue in self.queues.values()]),
+                "tenants":len(self.queues), "running":self.running,
+                "completed":self.completed, "workers":len(self.executors)}
+
+    async def handle_request(self, line, writer, lock):
+        job_id = None
+        try:
+            job = json.loads(line)
+            job_id = job.get("id")
+            if ("stats" == job.get("op")):
+                response = self.stats()
+            elif (job.get("op", "recover") in ("recover", "decrypt")):
+                job.setdefault("scheme", "pkcs1")
+                job["id"] = job_id
+                with Timer() as t:
+                    response = await self.submit(job)
+                response["latency"] = t.interval
+            else:
+                response = {"error":"Unknown op " + str(job.get("op")) + "."}
+        except (ValueError, TypeError, KeyError, AttributeError) as err:
+            response = {"error":str(err)}
+        response["id"] = job_id
+        async with lock:
+            writer.write((json.dumps(response) + "\n").encode())
+            await writer.drain()
+
+    async def handle_client(self, reader, writer):
+        lock = asyncio.Lock()
+        tasks = set()
+        try:
+            while True:
+                line = await reader.readline()
+                if (0 == len(line)):
+                    break
+                if (0 == len(line.strip())):
+                    continue
+                task = asyncio.create_task(self.handle_request(line, writer, lock))
+                tasks.add(task)
+                task.add_done_callback(tasks.discard)
+            if (0 != len(tasks)):
+                await asyncio.gather(*tasks)
+        finally:
+            writer.close()
+
+# Starts the service on a Unix socket (path) or on 127.0.0.1:port and returns
+# (service, server, dispatcher task).
+async def start_service(path=None, port=None, workers=None):
+    service = RecoveryService(workers)
+    if (None != path):
+        server = await asyncio.start_unix_server(service.handle_client, path=path)
+    else:
+        server = await asyncio.start_server(service.handle_client, host="127.0.0.1", port=port)
+    dispatcher = asyncio.create_task(service.dispatch())
+    return (service, server, dispatcher)
+
+async def serve(path, port, workers):
+    (service, server, dispatcher) = await start_service(path, port, workers)
+    sys.stderr.write("Listening on " + str(path if (None != path) else port) + " with " +
+                     str(len(service.executors)) + " workers.\n")
+    try:
+        async with server:
+            await server.serve_forever()
+    finally:
+        dispatcher.cancel()
+        service.shutdown()
+
+def main(argv):
+    parser = argparse.ArgumentParser(description="Local RSA plaintext recovery service.")
+    parser.add_argument("--socket", help="Unix socket path to listen on")
+    parser.add_argument("--port", type=int, help="TCP port to listen on, on 127.0.0.1")
+    parser.add_argument("--workers", type=int, default=os.cpu_count(), help="worker processes")
+    args = parser.parse_args(argv)
+
+    if ((None == args.socket) == (None == args.port)):
+        print("ERROR: give exactly one of --socket and --port.")
+        return 1
+
+    try:
+        asyncio.run(serve(args.socket, args.port, args.workers))
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
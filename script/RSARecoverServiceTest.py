@@ -0,0 +1,137 @@
+#
+# RSARecoverServiceTest.py - Test for the local recovery service
+#
+# Copyright (c) Microsoft Corporation. Licensed under the MIT license.
+#
+
+from RSARecoverService import *
+
+import RSATestCases
+import tempfile
+
+async def request_all(path, requests):
+    (reader, writer) = await asyncio.open_unix_connection(path)
+    for request in requests:
+        writer.write((json.dumps(request) + "\n").encode())
+    await writer.drain()
+    writer.write_eof()
+    responses = {}
+    while True:
+        line = await reader.readline()
+        if (0 == len(line)):
+            break
+        response = json.loads(line)
+        responses[response["id"]] = response
+    writer.close()
+    return responses
+
+async def run_service(path, requests):
+    (service, server, dispatcher) = await start_service(path=path, workers=2)
+    try:
+        async with server:
+            responses = await request_all(path, requests)
+            stats = await request_all(path, [{"id":"stats", "op":"stats"}])
+    finally:
+        dispatcher.cancel()
+        service.shutdown()
+    return (responses, stats["stats"])
+
+# A job goes to its key's worker while that worker is free, and to another
+# free worker while it is busy.
+async def check_worker_choice(p, q):
+    service = RecoveryService(workers=3)
+    try:
+        job = {"p":p, "q":q}
+        pinned = service.worker_for(job)
+        await service.worker_slots[pinned].acquire()
+        other = service.worker_for(job)
+        service.worker_slots[pinned].release()
+        return ((pinned == service.worker_for({"p":q, "q":p})) and (pinned != other) and
+                (pinned == service.worker_for(job)))
+    finally:
+        service.shutdown()
+
+def test_worker_choice(bad_prvk):
+    if (not asyncio.run(check_worker_choice(bad_prvk["p"], bad_prvk["q"]))):
+        print("Service worker choice FAILED.")
+        return False
+    print("PASSED.")
+    return True
+
+# Shutting down with one job running and more queued cancels the queued
+# ones and waits for the running one.
+async def check_shutdown(bad_prvk, pt):
+    (p, q, N, e) = (bad_prvk["p"], bad_prvk["q"], bad_prvk["N"], bad_prvk["e"])
+    service = RecoveryService(workers=1)
+    dispatcher = asyncio.create_task(service.dispatch())
+    jobs = [{"id":i, "p":p, "q":q, "e":e, "scheme":"pkcs1",
+             "ct":RSAEncrypt_PKCS1(pt, N, e).hex()} for i in range(4)]
+    tasks = [asyncio.create_task(service.submit(job)) for job in jobs]
+    while (0 == service.running):
+        await asyncio.sleep(0.01)
+    dispatcher.cancel()
+    service.shutdown()
+    await asyncio.gather(*tasks, return_exceptions=True)
+    return (0 == len(service.queues)) and all([task.cancelled() for task in tasks[1:]])
+
+def test_shutdown(bad_prvk, pt):
+    try:
+        shutdown_ok = asyncio.run(check_shutdown(bad_prvk, pt))
+    except Exception as err:
+        print("Service shutdown raised " + repr(err) + ".")
+        shutdown_ok = False
+    if (not shutdown_ok):
+        print("Service shutdown with queued jobs FAILED.")
+        return False
+    print("PASSED.")
+    return True
+
+def test_service(bad_prvk, prvk, pt, hashfn):
+    (p, q, N, e) = (bad_prvk["p"], bad_prvk["q"], bad_prvk["N"], bad_prvk["e"])
+
+    requests = [{"id":"pkcs1", "tenant":"a", "p":p, "q":q, "e":e,
+                 "ct":RSAEncrypt_PKCS1(pt, N, e).hex()},
+                {"id":"oaep", "tenant":"a", "p":hex(p), "q":hex(q), "e":e, "scheme":"oaep", "hash":hashfn,
+                 "ct":RSAEncrypt_OAEP(pt, N, e, hashfn).hex()},
+                {"id":"decrypt", "tenant":"b", "op":"decrypt", "p":prvk["p"], "q":prvk["q"], "d":prvk["d"],
+                 "scheme":"oaep", "hash":hashfn,
+                 "ct":RSAEncrypt_OAEP(pt, prvk["N"], prvk["e"], hashfn).hex()},
+                {"id":"bad scheme", "tenant":"b", "p":p, "q":q, "e":e, "scheme":"none", "ct":"00"},
+                {"id":"bad op", "op":"none"}]
+
+    with tempfile.TemporaryDirectory() as tmpdir:
+        (responses, stats) = asyncio.run(run_service(os.path.join(tmpdir, "service.sock"), requests))
+
+    if (len(requests) != len(responses)):
+        print("Service responses FAILED.")
+        return False
+
+    for name in ["pkcs1", "oaep"]:
+        if (pt not in [bytes.fromhex(r["plaintext"]) for r in responses[name].get("results", [])]):
+            print("Service " + name + " recovery FAILED.")
+            return False
+
+    if (pt != bytes.fromhex(responses["decrypt"].get("plaintext", ""))):
+        print("Service decryption FAILED.")
+        return False
+
+    if (("error" not in responses["bad scheme"]) or ("error" not in responses["bad op"])):
+        print("Service errors FAILED.")
+        return False
+
+    if ((0 != stats["queued"]) or (4 != stats["completed"])):
+        print("Service stats FAILED.")
+        return False
+
+    print("PASSED.")
+    return True
+
+if __name__ == "__main__":
+    pt = RSATestCases.pt
+
+    bad_prvk = RSATestCases.bad_priv_keys[0]
+    prvk = RSATestCases.valid_priv_keys[0]
+    print("RSA recovery service " + str(bad_prvk["bitlength"]) + "bit test case:\n")
+    test_service(bad_prvk, prvk, pt, "sha256")
+    test_worker_choice(bad_prvk)
+    test_shutdown(bad_prvk, pt)
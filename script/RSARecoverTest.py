@@ -0,0 +1,86 @@
+#
+# RSARecoverTest.py - Test for the bulk recovery command line tool
+#
+# Copyright (c) Microsoft Corporation. Licensed under the MIT license.
+#
+
+from RSARecover import *
+
+import RSATestCases
+import io
+import tempfile
+
+def test_recover(bad_prvk, pt, hashfn):
+    (p, q, N, e) = (bad_prvk["p"], bad_prvk["q"], bad_prvk["N"], bad_prvk["e"])
+
+    jobs = [{"id":"pkcs1", "p":hex(p), "q":str(q), "e":e, "ct":RSAEncrypt_PKCS1(pt, N, e).hex()},
+            {"id":"oaep", "p":p, "q":q, "e":e, "scheme":"oaep", "hash":hashfn,
+             "ct":RSAEncrypt_OAEP(pt, N, e, hashfn).hex()},
+            {"id":"bad scheme", "p":p, "q":q, "e":e, "scheme":"none", "ct":"00"}]
+
+    with tempfile.TemporaryDirectory() as tmpdir:
+        jobfile = os.path.join(tmpdir, "jobs.jsonl")
+        outfile = os.path.join(tmpdir, "results.jsonl")
+        with open(jobfile, "w") as f:
+            for job in jobs:
+                f.write(json.dumps(job) + "\n")
+            # Malformed lines are reported as errors of their own.
+            f.write("{\"id\": \"torn\n")
+            f.write(json.dumps({"id":"bad key", "p":"zz", "q":q, "e":e, "ct":"00"}) + "\n")
+
+        # No --first: a PKCS #1 v1.5 false positive may be found before pt.
+        stderr = io.StringIO()
+        with contextlib.redirect_stderr(stderr):
+            status = main([jobfile, "-o", outfile, "--workers", "2", "--batch-size", "1"])
+        with open(outfile, "r") as f:
+            records = [json.loads(line) for line in f]
+
+    errors = [json.loads(line) for line in stderr.getvalue().splitlines() if ("\"error\"" in line)]
+    if ((1 != status) or (["4", "bad key", "bad scheme"] != sorted([str(error["id"]) for error in errors]))):
+        print("Recover errors for bad jobs FAILED.")
+        return False
+
+    found = {}
+    for record in records:
+        found.setdefault(record["id"], []).append(bytes.fromhex(record["plaintext"]))
+    if ((["oaep", "pkcs1"] != sorted(found.keys())) or (pt not in found["pkcs1"]) or (pt not in found["oaep"])):
+        print("Recover plaintexts FAILED.")
+        return False
+
+    print("PASSED.")
+    return True
+
+# --first stops at the first valid plaintext, which for OAEP is pt.
+def test_recover_first(bad_prvk, pt, hashfn):
+    (p, q, N, e) = (bad_prvk["p"], bad_prvk["q"], bad_prvk["N"], bad_prvk["e"])
+
+    job = {"id":"oaep", "p":p, "q":q, "e":e, "scheme":"oaep", "hash":hashfn,
+           "ct":RSAEncrypt_OAEP(pt, N, e, hashfn).hex()}
+
+    with tempfile.TemporaryDirectory() as tmpdir:
+        jobfile = os.path.join(tmpdir, "jobs.jsonl")
+        outfile = os.path.join(tmpdir, "results.jsonl")
+        with open(jobfile, "w") as f:
+            f.write(json.dumps(job) + "\n")
+
+        stderr = io.StringIO()
+        with contextlib.redirect_stderr(stderr):
+            status = main([jobfile, "-o", outfile, "--workers", "1", "--first"])
+        with open(outfile, "r") as f:
+            records = [json.loads(line) for line in f]
+
+    if ((0 != status) or (1 != len(records)) or (pt != bytes.fromhex(records[0]["plaintext"])) or
+        ("WARNING" in stderr.getvalue())):
+        print("Recover --first FAILED.")
+        return False
+
+    print("PASSED.")
+    return True
+
+if __name__ == "__main__":
+    pt = RSATestCases.pt
+
+    bad_prvk = RSATestCases.bad_priv_keys[0]
+    print("RSA bulk recovery " + str(bad_prvk["bitlength"]) + "bit test case:\n")
+    test_recover(bad_prvk, pt, "sha256")
+    test_recover_first(bad_prvk, pt, "sha256")
@@ -1,4 +1,5 @@
 from RSAMath import *
+import json
 
 def make_private_key(p, q, N, e):
     if (N != p*q):
@@ -52,10 +53,22 @@ pt = pti.to_bytes(32, 'big')
 def make_incorrect_key(p, q, N, e, bitlength):
     if (p*q != N):
         raise ValueError("Supplied primes do not equal supplied modulus.")
-    if (0 != (p-1)*(q-1) % e):
+    if (1 == math.gcd((p-1)*(q-1), e)):
         raise ValueError("This key is not an incorrectly generated key.")
     return {"p":p, "q":q, "N":N, "e":e, "bitlength":bitlength}
 
+# Reads the keys written by RSABadKeyGen, one JSON object per line.
+def load_bad_priv_keys(path):
+    keys = []
+    with open(path, "r") as f:
+        for line in f:
+            if (0 == len(line.strip())):
+                continue
+            key = json.loads(line)
+            (p, q, N) = (int(key["p"], 0), int(key["q"], 0), int(key["N"], 0))
+            keys.append(make_incorrect_key(p, q, N, key["e"], key["bitlength"]))
+    return keys
+
 e = 2**16 + 1
 
 bad_p1 = 6446406967979134500227507821837261646718223794770361565549068232090697008176187468326049403673759226642185682453441478074950003893163806293725825406785437
@@ -81,3 +94,36 @@ bad_priv_keys = [make_incorrect_key(bad_p1, bad_q1, bad_N1, e, 1024),
 
 
 
+# Incorrectly generated keys where the public exponent divides both p-1 and q-1
+
+double_bad_p1 = 6703943778014143020828481677858021593224704504311435590468073802797695009658940375942632261599171449791612044670381593661230310489296031688500732142981733
+double_bad_q1 = 6703914924679235308690594197099084243382173638458174988147262590118155626046960824051494734315723216888915694576860312093308597136977721518727404597937017
+double_bad_N1 = 44942668747639511801906325898336514030598965458312893532824120156080781110416402649994365113827931124348081849014302390974507752379445827417007676698648644135540897496937199333077733384611587878061154066984247057726109096544629075968817554916631937245289177465855545178397807866885985358365158401646915510461
+
+double_bad_priv_keys = [make_incorrect_key(double_bad_p1, double_bad_q1, double_bad_N1, e, 1024)]
+
+
+
+# Incorrectly generated key with a composite public exponent larger than
+# Fermat-4, e = 15*65537, that shares only the factor 15 with p-1.  The
+# ciphertexts have gcd(e, p-1) = 15 candidate roots instead of e.
+
+gen_bad_e1 = 15*(2**16 + 1)
+
+gen_bad_p1 = 6796901957982653055654606209971823783045326056766703070369732591074427791564798600153983125332761861246374309813051041597600602209376774812797420328063271
+gen_bad_q1 = 11614142363578375335190717440461496252897835929293053817744296725676032056762045553844089185916323691098424877410921760267362661922178553547171106861232847
+gen_bad_N1 = 78940186971295137321016219309063822086128759098655725931890237994614626709296074423266153837644215118909721207796212327471199273026201763788055307361313816781859935839402226893668313893772897765551544573362157059468306730907292877160104424875567297305866797344290860783548525917660845783540174441330879462537
+
+gen_bad_priv_keys = [make_incorrect_key(gen_bad_p1, gen_bad_q1, gen_bad_N1, gen_bad_e1, 1024)]
+
+
+
+# Incorrectly generated key where the square of the public exponent divides
+# p-1.  There is no decrypt exponent modulo p, the e-th root is found with a
+# discrete logarithm (see EthRootContext).
+
+sq_bad_p1 = 12262763084410143236855965306201937111980987892383666052905684870387304324692802816447485269321764321423082763445702346824121208340345592029899806422611637
+sq_bad_q1 = 13137748978324830970957666807414647852745406906777122851888026727662649303456154703713301914772789210487345668699222716491684771095513429515125411775705009
+sq_bad_N1 = 161105103183648812282170850013354081048977223379716360373330642619803300202645135646579203043877134665443091004793372659787306572075576653981823085141630292415171182892634932465881771790712119672398143338279011381862522092460212938120221847545215775849318809155178764666239307319102186105289813158024682589733
+
+sq_bad_priv_keys = [make_incorrect_key(sq_bad_p1, sq_bad_q1, sq_bad_N1, e, 1024)]